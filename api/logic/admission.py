@@ -0,0 +1,221 @@
+import os
+import json
+import math
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+try:
+    from .metrics import ADMISSION_REJECTIONS
+except ImportError:
+    # Fallback for running this module directly
+    from metrics import ADMISSION_REJECTIONS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and Retry-After to return."""
+
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class PriorityClass:
+    """
+    Scheduling parameters and live state for one request priority.
+
+    weight sets its share of freed slots while other priorities are also waiting.
+    shed_pressure is the upstream backlog, in seconds, above which new requests of
+    this priority are rejected outright instead of queued.
+    """
+
+    def __init__(self, name: str, weight: int = 1, max_concurrency: int = 64, max_queue: int = 100,
+                 max_queue_wait: float = 10.0, shed_pressure: float = math.inf):
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.shed_pressure = shed_pressure
+        self.queue: Deque[asyncio.Future] = deque()
+        self.in_flight = 0
+        # Smooth weighted round-robin state
+        self.current_weight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0, "upstream_saturated": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "in_flight": self.in_flight,
+            "waiting": len(self.queue),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+        }
+
+
+DEFAULT_PRIORITY_CLASSES: Dict[str, Dict[str, Any]] = {
+    "high": {"weight": 6, "max_concurrency": 64, "max_queue": 500, "max_queue_wait": 30.0},
+    "medium": {"weight": 3, "max_concurrency": 48, "max_queue": 200, "max_queue_wait": 10.0, "shed_pressure": 5.0},
+    "low": {"weight": 1, "max_concurrency": 16, "max_queue": 50, "max_queue_wait": 2.0, "shed_pressure": 1.0},
+}
+
+
+class AdmissionController:
+    """
+    Priority-aware admission in front of the agent.
+
+    At most max_concurrency requests run at once. Beyond that, requests wait in a
+    FIFO queue per priority; each freed slot goes to a waiting priority under its
+    own concurrency cap, chosen by smooth weighted round-robin. Requests are shed
+    with 429 when their priority's queue is full, with 503 when they wait longer
+    than max_queue_wait, and with 503 up front when the upstream backlog reported
+    by pressure() exceeds the priority's shed_pressure. Low priority has the
+    tightest limits, so it is shed first.
+    """
+
+    def __init__(
+        self,
+        classes: Dict[str, PriorityClass],
+        max_concurrency: int = 64,
+        pressure: Optional[Callable[[], float]] = None,
+        default_priority: str = "medium",
+        enabled: bool = True,
+    ):
+        self.classes = classes
+        self.max_concurrency = max_concurrency
+        self.pressure = pressure or (lambda: 0.0)
+        self.default_priority = default_priority
+        self.enabled = enabled
+        self.in_flight = 0
+
+    @classmethod
+    def from_env(cls, pressure: Optional[Callable[[], float]] = None) -> "AdmissionController":
+        """
+        ADMISSION_PRIORITIES (JSON) overrides fields of the default classes,
+        e.g. {"low": {"max_concurrency": 4, "shed_pressure": 0.5}}.
+        """
+        configs = {name: dict(config) for name, config in DEFAULT_PRIORITY_CLASSES.items()}
+        raw = os.getenv("ADMISSION_PRIORITIES")
+        if raw:
+            try:
+                for name, overrides in json.loads(raw).items():
+                    configs.setdefault(name, {}).update(overrides)
+            except (json.JSONDecodeError, AttributeError) as e:
+                logger.error(f"💥 Ignoring invalid ADMISSION_PRIORITIES ({e}); using the default classes")
+        return cls(
+            {name: PriorityClass(name, **config) for name, config in configs.items()},
+            max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64")),
+            pressure=pressure,
+            enabled=os.getenv("ADMISSION_ENABLED", "true").lower() not in ("0", "false", "no"),
+        )
+
+    def _class(self, priority: str) -> PriorityClass:
+        return self.classes.get(priority) or self.classes[self.default_priority]
+
+    def _reject(self, priority: PriorityClass, kind: str, status_code: int, retry_after: float,
+                reason: str) -> AdmissionRejected:
+        priority.rejected[kind] += 1
+        ADMISSION_REJECTIONS.inc(priority.name, kind)
+        logger.warning(f"🚦 Shedding {priority.name} priority request: {reason}")
+        return AdmissionRejected(status_code, retry_after, reason)
+
+    @asynccontextmanager
+    async def admit(self, priority: str) -> AsyncIterator[None]:
+        """Hold a concurrency slot for the duration of the block, or raise AdmissionRejected."""
+        if not self.enabled:
+            yield
+            return
+        priority_class = self._class(priority)
+        await self._acquire(priority_class)
+        try:
+            yield
+        finally:
+            self._release(priority_class)
+
+    async def _acquire(self, priority: PriorityClass) -> None:
+        pressure = self.pressure()
+        if pressure > priority.shed_pressure:
+            raise self._reject(
+                priority, "upstream_saturated", 503, min(pressure, 30.0),
+                f"Upstream is saturated (backlog {pressure:.1f}s)."
+            )
+
+        # Start at once only if nobody of this priority is already waiting
+        if (not priority.queue and self.in_flight < self.max_concurrency
+                and priority.in_flight < priority.max_concurrency):
+            self._start(priority)
+            return
+
+        if len(priority.queue) >= priority.max_queue:
+            raise self._reject(
+                priority, "queue_full", 429, priority.max_queue_wait,
+                f"Too many queued {priority.name} priority requests ({priority.max_queue})."
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        priority.queue.append(future)
+        priority.queued += 1
+        try:
+            done, _ = await asyncio.wait({future}, timeout=priority.max_queue_wait)
+        except asyncio.CancelledError:
+            # Client went away; give back a slot that was granted in the meantime
+            if future.done() and not future.cancelled():
+                self._release(priority)
+            else:
+                future.cancel()
+            raise
+        if not done:
+            future.cancel()
+            raise self._reject(
+                priority, "queue_timeout", 503, priority.max_queue_wait,
+                f"Waited more than {priority.max_queue_wait:.0f}s for capacity."
+            )
+
+    def _start(self, priority: PriorityClass) -> None:
+        priority.in_flight += 1
+        priority.admitted += 1
+        self.in_flight += 1
+
+    def _release(self, priority: PriorityClass) -> None:
+        priority.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand freed slots to waiting requests, weighted across priorities."""
+        while self.in_flight < self.max_concurrency:
+            eligible = []
+            for priority in self.classes.values():
+                # Requests that timed out or disconnected leave cancelled futures behind
+                while priority.queue and priority.queue[0].done():
+                    priority.queue.popleft()
+                if priority.queue and priority.in_flight < priority.max_concurrency:
+                    eligible.append(priority)
+            if not eligible:
+                return
+            total = sum(priority.weight for priority in eligible)
+            for priority in eligible:
+                priority.current_weight += priority.weight
+            chosen = max(eligible, key=lambda priority: priority.current_weight)
+            chosen.current_weight -= total
+            self._start(chosen)
+            chosen.queue.popleft().set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "upstream_pressure_seconds": round(self.pressure(), 3),
+            "priorities": {name: priority.stats() for name, priority in self.classes.items()},
+        }
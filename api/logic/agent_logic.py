@@ -1,12 +1,45 @@
 import os
 import asyncio
 import logging
-import re
 import json
-from typing import Dict, Any, List, Optional
-from pydantic import BaseModel
+import math
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from pydantic import BaseModel, PrivateAttr, ValidationError, field_validator
 import httpx
 
+try:
+    from .decision_cache import DecisionCache, make_cache_key
+    from .semantic_cache import SemanticCache
+    from .single_flight import SingleFlight
+    from .stream_parser import IncrementalDecisionParser
+    from .http_transport import TransportSettings, create_http_client, warm_up
+    from .retry_policy import RetryPolicy, RETRYABLE_STATUS_CODES, parse_retry_after
+    from .model_backends import BackendRouter, ModelBackend
+    from .json_extract import extract_json, preview
+    from .prompt_templates import get_template, render_context
+    from .context_cache import ContextCacheManager
+    from .metrics import STAGE_SECONDS, FALLBACKS, UPSTREAM_RESPONSES, fallback_reason_label
+    from .tracing import start_span, set_span_attributes, mark_span_error
+    from .token_usage import TokenUsage, UsageAccountant
+    from .generation_profiles import GenerationProfile, OutputLengthPredictor, load_profiles
+except ImportError:
+    # Fallback for running this module directly
+    from decision_cache import DecisionCache, make_cache_key
+    from semantic_cache import SemanticCache
+    from single_flight import SingleFlight
+    from stream_parser import IncrementalDecisionParser
+    from http_transport import TransportSettings, create_http_client, warm_up
+    from retry_policy import RetryPolicy, RETRYABLE_STATUS_CODES, parse_retry_after
+    from model_backends import BackendRouter, ModelBackend
+    from json_extract import extract_json, preview
+    from prompt_templates import get_template, render_context
+    from context_cache import ContextCacheManager
+    from metrics import STAGE_SECONDS, FALLBACKS, UPSTREAM_RESPONSES, fallback_reason_label
+    from tracing import start_span, set_span_attributes, mark_span_error
+    from token_usage import TokenUsage, UsageAccountant
+    from generation_profiles import GenerationProfile, OutputLengthPredictor, load_profiles
+
 # Configure logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -17,15 +50,252 @@ class Decision(BaseModel):
     reasoning: List[str]
     key_factors: Dict[str, str]
 
+    # Set when the decision was produced by _fallback_decision rather than the model
+    _fallback_reason: Optional[str] = PrivateAttr(default=None)
+    # Tokens spent on the upstream call that produced this decision; None if there was none
+    _usage: Optional[TokenUsage] = PrivateAttr(default=None)
+
+    @field_validator("key_factors", mode="before")
+    @classmethod
+    def _key_factors_from_list(cls, value: Any) -> Any:
+        # Structured output returns key_factors as [{"factor": ..., "explanation": ...}]
+        if isinstance(value, list):
+            return {
+                str(item.get("factor", f"Factor {i + 1}")): str(item.get("explanation", ""))
+                for i, item in enumerate(value) if isinstance(item, dict)
+            }
+        return value
+
+    @property
+    def is_fallback(self) -> bool:
+        return self._fallback_reason is not None
+
+    @property
+    def usage(self) -> Optional[TokenUsage]:
+        return self._usage
+
+DECISION_FIELDS = ("decision", "confidence", "reasoning", "key_factors")
+
+# Gemini responseSchema for Decision. The schema dialect has no free-form maps, so
+# key_factors is requested as a list of factor/explanation pairs and folded back
+# into a dict by Decision's validator.
+DECISION_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "decision": {"type": "STRING", "description": "Clear and specific recommendation"},
+        "confidence": {"type": "NUMBER", "description": "Certainty of the recommendation, 0.0 to 1.0"},
+        "reasoning": {"type": "ARRAY", "items": {"type": "STRING"}, "description": "Key points of analysis"},
+        "key_factors": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "factor": {"type": "STRING"},
+                    "explanation": {"type": "STRING", "description": "How this factor impacts the decision"},
+                },
+                "required": ["factor", "explanation"],
+                "propertyOrdering": ["factor", "explanation"],
+            },
+        },
+    },
+    "required": list(DECISION_FIELDS),
+    "propertyOrdering": list(DECISION_FIELDS),
+}
+
+CIRCUIT_OPEN_REASON = "Upstream model is temporarily unavailable (all backends unhealthy)."
+
+TRUNCATED_REASON = "The model response was cut off at the output token limit."
+
+# Statuses with which generateContent rejects an unknown or expired cachedContent reference
+CACHED_CONTENT_REJECTED_STATUS_CODES = {400, 403, 404}
+
+class RateLimitExceeded(Exception):
+    """Raised when the rate limiter sheds a request instead of queueing it."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Upstream rate limit budget exhausted; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Continuously refilling token bucket; capacity is the budget per minute (inf for no limit)."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if math.isinf(self.capacity):
+            self.tokens = self.capacity
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        # A negative amount refunds an over-estimate
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def clamp(self, remaining: float) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+class RateLimiter:
+    """
+    Client-side scheduler for the Gemini requests-per-minute and tokens-per-minute quotas.
+
+    Callers acquire budget before each upstream call. When the budget is exhausted
+    they either queue (FIFO, up to max_wait seconds) or are shed immediately,
+    depending on mode. Response headers and 429s tighten the local budget so it
+    tracks what the server actually allows.
+
+    Quotas depend on the API key's tier, so there is no default: from_env only
+    enables the limiter when GEMINI_RPM or GEMINI_TPM is set, and a quota left
+    unset is unlimited. The wait for budget is the upstream pressure admission
+    control sheds on (IntelligentAgent.upstream_pressure), so a quota set below
+    the real one also sheds low-priority requests early.
+    """
+
+    def __init__(self, requests_per_minute: float = math.inf, tokens_per_minute: float = math.inf,
+                 mode: str = "queue", max_wait: float = 10.0, enabled: bool = True):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.mode = mode
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.throttled = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        # The quota is per API key; each worker process gets an equal share of it
+        workers = max(int(os.getenv("WEB_CONCURRENCY") or 1), 1)
+        rpm = os.getenv("GEMINI_RPM")
+        tpm = os.getenv("GEMINI_TPM")
+        return cls(
+            requests_per_minute=float(rpm) / workers if rpm else math.inf,
+            tokens_per_minute=float(tpm) / workers if tpm else math.inf,
+            mode=os.getenv("GEMINI_RATE_LIMIT_MODE", "queue").lower(),
+            max_wait=float(os.getenv("GEMINI_RATE_LIMIT_MAX_WAIT", "10")),
+            enabled=bool(rpm or tpm)
+            and os.getenv("GEMINI_RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no"),
+        )
+
+    def _wait_time(self, tokens: float) -> float:
+        blocked = max(self.blocked_until - time.monotonic(), 0.0)
+        return max(blocked, self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        if not self.enabled:
+            return
+        tokens = min(float(estimated_tokens), self.tokens.capacity)
+        deadline = time.monotonic() + self.max_wait
+        async with self._lock:
+            waited = False
+            while True:
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    self.admitted += 1
+                    return
+                if self.mode == "shed" or time.monotonic() + wait > deadline:
+                    self.shed += 1
+                    raise RateLimitExceeded(wait)
+                if not waited:
+                    self.queued += 1
+                    waited = True
+                await asyncio.sleep(wait)
+
+    def try_acquire(self, estimated_tokens: int) -> bool:
+        """Take budget only if it is free right now and nobody is queued for it; never waits."""
+        if not self.enabled:
+            return True
+        tokens = min(float(estimated_tokens), self.tokens.capacity)
+        if self._lock.locked() or self._wait_time(tokens) > 0:
+            return False
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.admitted += 1
+        return True
+
+    def backlog_seconds(self) -> float:
+        """How long a new request would currently wait for quota."""
+        if not self.enabled:
+            return 0.0
+        return self._wait_time(1)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token budget once the real usage of a request is known."""
+        if self.enabled and actual_tokens is not None:
+            self.tokens.take(actual_tokens - min(float(estimated_tokens), self.tokens.capacity))
+
+    def update_from_response(self, status_code: int, headers: httpx.Headers) -> None:
+        """Feed server-reported quota state back into the local budget."""
+        if not self.enabled:
+            return
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        if remaining_requests is not None:
+            try:
+                self.requests.clamp(float(remaining_requests))
+            except ValueError:
+                pass
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            try:
+                self.tokens.clamp(float(remaining_tokens))
+            except ValueError:
+                pass
+        if status_code == 429:
+            self.throttled += 1
+            self.requests.clamp(0)
+            retry_after = parse_retry_after(headers.get("retry-after"))
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "requests_per_minute": None if math.isinf(self.requests.capacity) else self.requests.capacity,
+            "tokens_per_minute": None if math.isinf(self.tokens.capacity) else self.tokens.capacity,
+            "requests_available": None if math.isinf(self.requests.tokens) else round(self.requests.tokens, 2),
+            "tokens_available": None if math.isinf(self.tokens.tokens) else round(self.tokens.tokens),
+            "blocked_for_seconds": round(max(self.blocked_until - time.monotonic(), 0.0), 2),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "throttled": self.throttled,
+        }
+
 class IntelligentAgent:
     """
     A sophisticated AI agent for decision-making, powered by Google Gemini API.
     """
-    _instance: Optional["IntelligentAgent"] = None
-
     def __init__(self):
-        self.api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
         self.google_api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        self.router = BackendRouter.from_env(default_api_key=self.google_api_key)
+        # Cache keys and warm-up use the primary backend; routing is transparent to callers
+        self.api_url = self.router.primary.api_url
+        # Native JSON mode: the schema travels in generationConfig instead of the prompt
+        self.structured_output = os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() not in ("0", "false", "no")
+        template_version = os.getenv("PROMPT_TEMPLATE_VERSION")
+        self.prompt_template = get_template(
+            "decision_schema" if self.structured_output else "decision_json",
+            int(template_version) if template_version else None,
+        )
         
         if not self.google_api_key:
             logger.warning("GOOGLE_API_KEY is not set. Using fallback responses.")
@@ -34,44 +304,190 @@ class IntelligentAgent:
             self.use_fallback = False
             logger.info("✅ Google API key found.")
         
-        self.http_client = httpx.AsyncClient(timeout=45.0)
-        logger.info(f"✅ Agent initialized to use Google Gemini API")
+        self.transport_settings = TransportSettings.from_env()
+        self.http_client = create_http_client(self.transport_settings)
+        self.context_cache = ContextCacheManager.from_env(self.http_client)
+        self.decision_cache = DecisionCache.from_env()
+        self.semantic_cache = SemanticCache.from_env()
+        self.single_flight = SingleFlight()
+        self.rate_limiter = RateLimiter.from_env()
+        self.retry_policy = RetryPolicy.from_env()
+        self.token_usage = UsageAccountant.from_env()
+        self.generation_profiles = load_profiles()
+        self.output_predictor = OutputLengthPredictor.from_env()
+        logger.info("✅ Agent initialized to use Google Gemini API")
 
-    @classmethod
-    def get_instance(cls) -> "IntelligentAgent":
-        if cls._instance is None:
-            cls._instance = cls()
-        return cls._instance
+    async def close(self) -> None:
+        """Delete the context caches this agent created, close its connection pool and its decision cache."""
+        await self.context_cache.close(self.router.backends)
+        await self.http_client.aclose()
+        await self.decision_cache.close()
 
-    async def generate_decision(self, task_description: str, context: Dict[str, Any]) -> Decision:
+    def upstream_pressure(self) -> float:
+        """
+        Seconds before a new upstream call could start: the local quota backlog, or
+        the time until a backend's circuit reopens when all of them are open.
+        Admission control sheds low-priority work when this grows.
+        """
+        if self.use_fallback:
+            return 0.0
+        return max(self.rate_limiter.backlog_seconds(), self.router.unavailable_for())
+
+    async def warm_up(self) -> None:
+        """Pre-open pooled upstream connections so the first requests skip the TLS handshake."""
+        if self.use_fallback:
+            return
+        for url in {backend.api_url for backend in self.router.backends}:
+            await warm_up(self.http_client, url, self.transport_settings.warmup_connections)
+
+    async def generate_decision(
+        self, task_description: str, context: Dict[str, Any], priority: str = "medium"
+    ) -> Decision:
+        with start_span("IntelligentAgent.generate_decision", {
+            "agent.prompt_template": self.prompt_template.id,
+            "agent.priority": priority,
+        }):
+            decision = await self._generate_decision(task_description, context, priority)
+            if decision.is_fallback:
+                set_span_attributes({"agent.fallback_reason": decision._fallback_reason})
+                mark_span_error(decision._fallback_reason)
+            return decision
+
+    async def _generate_decision(self, task_description: str, context: Dict[str, Any], priority: str) -> Decision:
         # If no API key is available, use fallback immediately
         if self.use_fallback:
             return self._fallback_decision("Google API key not configured. Using demo response.")
         
-        prompt = self._create_structured_prompt(task_description, context)
-        
-        payload = {
-            "contents": [{
-                "parts": [{"text": prompt}]
-            }],
-            "generationConfig": {
-                "temperature": 0.7,
-                "maxOutputTokens": 1000
-            }
-        }
+        profile = self._profile(priority)
+        with STAGE_SECONDS.time("prompt_build"):
+            prompt = self._create_structured_prompt(task_description, context)
+            payload = self._build_payload(prompt, profile)
+        set_span_attributes({"gen_ai.request.max_tokens": payload["generationConfig"]["maxOutputTokens"]})
+
+        cache_key = self._cache_key(prompt, payload, profile)
+        cached = await self.decision_cache.get(cache_key)
+        set_span_attributes({"agent.cache_hit": cached is not None})
+        if cached is not None:
+            return Decision(**cached)
+
+        scope = self._semantic_scope(payload, profile)
+        text = self._semantic_text(task_description, context)
+        similar = self._semantic_lookup(scope, text)
+        if similar is not None:
+            return similar
+
+        # Identical concurrent requests share one upstream call
+        joined = self.single_flight.in_flight(cache_key)
+        decision = await self.single_flight.do(
+            cache_key, lambda: self._request_decision(payload, cache_key, profile)
+        )
+        if joined:
+            # The tokens were spent, and are reported, by the request that made the call
+            decision = decision.model_copy()
+            decision._usage = None
+            return decision
+        if not decision.is_fallback:
+            self.semantic_cache.add(scope, cache_key, text, decision.model_dump())
+        return decision
+
+    async def _request_decision(
+        self, payload: Dict[str, Any], cache_key: str, profile: GenerationProfile
+    ) -> Decision:
+        # Try backends best-first, failing over when one is unhealthy
+        tried: List[str] = []
+        decision: Optional[Decision] = None
+        while True:
+            backend = self.router.select(exclude=tried, cost_weight=profile.cost_weight)
+            if backend is None:
+                return decision or self._fallback_decision(CIRCUIT_OPEN_REASON)
+            tried.append(backend.name)
+            decision, failover = await self._request_from_backend(backend, payload, cache_key, profile)
+            budget = payload["generationConfig"]["maxOutputTokens"]
+            if decision._fallback_reason == TRUNCATED_REASON and budget < profile.max_output_tokens:
+                # The predicted budget was too small for this one; retry with the full profile budget
+                logger.warning(f"✂️ Output cut off at {budget} tokens; retrying with {profile.max_output_tokens}")
+                payload = self._with_output_budget(payload, profile.max_output_tokens)
+                decision, failover = await self._request_from_backend(backend, payload, cache_key, profile)
+            if not failover:
+                return decision
+            logger.warning(f"↪️ Backend '{backend.name}' failed; trying another backend")
+
+    async def _request_from_backend(
+        self, backend: ModelBackend, payload: Dict[str, Any], cache_key: str, profile: GenerationProfile
+    ) -> Tuple[Decision, bool]:
+        """Call one backend. Returns the decision and whether another backend should be tried."""
+        estimated_tokens = self._estimate_tokens(payload)
+        url = ""
+        cached_content = None
+        request_payload = payload
+        # The breaker admitted this call; until it hears how the call went, the finally gives the slot back
+        settled = False
+
+        # Upstream time of the latest attempt; rate limit waits and retry sleeps are not the backend's
+        upstream_seconds = 0.0
+
+        async def send() -> httpx.Response:
+            nonlocal request_payload, upstream_seconds
+            started = time.perf_counter()
+            try:
+                response = await self._post(backend, url, request_payload)
+                if request_payload is not payload and response.status_code in CACHED_CONTENT_REJECTED_STATUS_CODES:
+                    # The cached instructions expired or were deleted upstream; send them inline
+                    logger.warning(f"🗄️ Cached content {cached_content} rejected with status {response.status_code}")
+                    self.context_cache.invalidate(backend, self.prompt_template)
+                    request_payload = payload
+                    started = time.perf_counter()
+                    response = await self._post(backend, url, request_payload)
+            finally:
+                upstream_seconds = time.perf_counter() - started
+            self.rate_limiter.update_from_response(response.status_code, response.headers)
+            return response
 
         try:
-            url = f"{self.api_url}?key={self.google_api_key}"
-            response = await self.http_client.post(url, json=payload)
+            url = backend.request_url()
+            cached_content = await self.context_cache.get(backend, self.prompt_template)
+            if cached_content:
+                request_payload = self.context_cache.apply(payload, cached_content)
+            try:
+                with STAGE_SECONDS.time("http_wait"):
+                    # Every attempt, including retries and hedges, spends rate limit budget
+                    response = await self.retry_policy.execute(
+                        send,
+                        acquire=lambda: self.rate_limiter.acquire(estimated_tokens),
+                        try_acquire=lambda: self.rate_limiter.try_acquire(estimated_tokens),
+                    )
+            except (httpx.TimeoutException, httpx.TransportError):
+                backend.record(failed=True, latency=upstream_seconds)
+                settled = True
+                raise
+            upstream_failed = response.status_code in RETRYABLE_STATUS_CODES
+            backend.record(failed=upstream_failed, latency=upstream_seconds)
+            settled = True
             response.raise_for_status()
             
             api_response = response.json()
+            usage_metadata = (api_response or {}).get("usageMetadata")
+            self.rate_limiter.record_usage(estimated_tokens, (usage_metadata or {}).get("totalTokenCount"))
+            usage = self._record_token_usage(usage_metadata)
             if api_response and "candidates" in api_response and api_response["candidates"]:
-                content = api_response["candidates"][0]["content"]["parts"][0]["text"]
-                return self._parse_llm_output(content)
+                candidate = api_response["candidates"][0]
+                truncated = candidate.get("finishReason") == "MAX_TOKENS"
+                self._record_output_length(profile, payload, usage, truncated)
+                content = candidate["content"]["parts"][0]["text"]
+                decision = self._parse_llm_output(content)
+                decision._usage = usage
+                if truncated and decision.is_fallback:
+                    decision._fallback_reason = TRUNCATED_REASON
+                # Only genuine model decisions are worth replaying
+                if not decision.is_fallback:
+                    await self.decision_cache.set(cache_key, decision.model_dump())
+                return decision, False
 
-            return self._fallback_decision("Google Gemini API returned an empty or invalid response.")
+            return self._fallback_decision("Google Gemini API returned an empty or invalid response."), False
             
+        except RateLimitExceeded as e:
+            logger.warning(f"🚦 Shedding Gemini request: {e}")
+            return self._fallback_decision(f"Rate limit reached. Please retry in {e.retry_after:.0f} seconds."), False
         except httpx.HTTPStatusError as e:
             error_body = e.response.text
             logger.error(f"💥 Google Gemini API request failed with status {e.response.status_code}: {error_body}")
@@ -80,74 +496,277 @@ class IntelligentAgent:
                 detail = "API quota exceeded. Please check your Google Cloud billing and quotas."
             elif "invalid" in error_body.lower():
                 detail = "Invalid API key. Please check your GOOGLE_API_KEY environment variable."
-            return self._fallback_decision(detail)
+            return self._fallback_decision(detail), e.response.status_code in RETRYABLE_STATUS_CODES
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            logger.error(f"💥 Google Gemini request to backend '{backend.name}' failed: {e!r}")
+            return self._fallback_decision("The upstream model did not respond."), True
         except Exception as e:
             logger.error(f"💥 Google Gemini generation failed during task execution: {e}")
-            return self._fallback_decision(f"An unexpected error occurred during the API call.")
+            return self._fallback_decision("An unexpected error occurred during the API call."), False
+        finally:
+            if not settled:
+                # Shed locally, cancelled or failed before a response: not an upstream outcome
+                backend.circuit_breaker.release()
+
+    async def _post(self, backend: ModelBackend, url: str, payload: Dict[str, Any]) -> httpx.Response:
+        """One upstream generateContent POST, traced and counted by status code."""
+        with start_span("POST", {
+            "http.request.method": "POST",
+            "gen_ai.system": "gemini",
+            "gen_ai.request.model": backend.model,
+            "agent.backend": backend.name,
+        }) as span:
+            response = await self.http_client.post(url, json=payload)
+            if span is not None:
+                span.set_attribute("http.response.status_code", response.status_code)
+        UPSTREAM_RESPONSES.inc(backend.name, str(response.status_code))
+        return response
+
+    async def stream_decision(
+        self, task_description: str, context: Dict[str, Any], priority: str = "medium"
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a decision as (event, data) pairs while the model is still generating.
+
+        Emits "decision", "confidence", "reasoning" and "key_factors" events as soon as
+        each field is complete, then a final "complete" event carrying the validated
+        Decision. Cached and fallback decisions are replayed through the same events.
+        """
+        if self.use_fallback:
+            for event in self._decision_events(self._fallback_decision("Google API key not configured. Using demo response.")):
+                yield event
+            return
+
+        profile = self._profile(priority)
+        with STAGE_SECONDS.time("prompt_build"):
+            prompt = self._create_structured_prompt(task_description, context)
+            payload = self._build_payload(prompt, profile)
+
+        cache_key = self._cache_key(prompt, payload, profile)
+        cached = await self.decision_cache.get(cache_key)
+        if cached is not None:
+            for event in self._decision_events(Decision(**cached)):
+                yield event
+            return
+
+        scope = self._semantic_scope(payload, profile)
+        text = self._semantic_text(task_description, context)
+        similar = self._semantic_lookup(scope, text)
+        if similar is not None:
+            for event in self._decision_events(similar):
+                yield event
+            return
+
+        backend = self.router.select(cost_weight=profile.cost_weight)
+        if backend is None:
+            yield "error", CIRCUIT_OPEN_REASON
+            yield "complete", self._fallback_decision(CIRCUIT_OPEN_REASON)
+            return
+
+        estimated_tokens = self._estimate_tokens(payload)
+        parser = IncrementalDecisionParser()
+        chunks: List[str] = []
+        usage_metadata: Optional[Dict[str, Any]] = None
+        finish_reason: Optional[str] = None
+        started = time.perf_counter()
+        # As in _request_from_backend: an admitted call the breaker never hears about gives its slot back
+        settled = False
+        try:
+            await self.rate_limiter.acquire(estimated_tokens)
+            url = backend.request_url(stream=True)
+            cached_content = await self.context_cache.get(backend, self.prompt_template)
+            request_payload = self.context_cache.apply(payload, cached_content) if cached_content else payload
+            started = time.perf_counter()
+            async with self.http_client.stream("POST", url, json=request_payload) as response:
+                # For streams the wait is time to response headers, not the whole generation
+                STAGE_SECONDS.observe(time.perf_counter() - started, "http_wait")
+                UPSTREAM_RESPONSES.inc(backend.name, str(response.status_code))
+                self.rate_limiter.update_from_response(response.status_code, response.headers)
+                # Judge health on time-to-first-byte; a long healthy stream is not slow
+                backend.record(
+                    failed=response.status_code in RETRYABLE_STATUS_CODES,
+                    latency=time.perf_counter() - started,
+                )
+                settled = True
+                if response.is_error:
+                    await response.aread()
+                    if cached_content and response.status_code in CACHED_CONTENT_REJECTED_STATUS_CODES:
+                        self.context_cache.invalidate(backend, self.prompt_template)
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = json.loads(line[5:])
+                    usage_metadata = chunk.get("usageMetadata", usage_metadata)
+                    candidates = chunk.get("candidates") or []
+                    if not candidates:
+                        continue
+                    finish_reason = candidates[0].get("finishReason", finish_reason)
+                    parts = candidates[0].get("content", {}).get("parts") or []
+                    chunk_text = "".join(part.get("text", "") for part in parts)
+                    chunks.append(chunk_text)
+                    for event in parser.feed(chunk_text):
+                        yield event
+        except RateLimitExceeded as e:
+            logger.warning(f"🚦 Shedding Gemini streaming request: {e}")
+            reason = f"Rate limit reached. Please retry in {e.retry_after:.0f} seconds."
+            yield "error", reason
+            yield "complete", self._fallback_decision(reason)
+            return
+        except httpx.HTTPStatusError as e:
+            logger.error(f"💥 Google Gemini streaming request failed with status {e.response.status_code}: {e.response.text}")
+            yield "error", f"API Error (Status {e.response.status_code})."
+            yield "complete", self._fallback_decision(f"API Error (Status {e.response.status_code}).")
+            return
+        except Exception as e:
+            if not settled and isinstance(e, (httpx.TimeoutException, httpx.TransportError)):
+                backend.record(failed=True, latency=time.perf_counter() - started)
+                settled = True
+            logger.error(f"💥 Google Gemini streaming failed during task execution: {e}")
+            yield "error", "An unexpected error occurred during the API call."
+            yield "complete", self._fallback_decision("An unexpected error occurred during the API call.")
+            return
+        finally:
+            if not settled:
+                backend.circuit_breaker.release()
+
+        self.rate_limiter.record_usage(estimated_tokens, (usage_metadata or {}).get("totalTokenCount"))
+        usage = self._record_token_usage(usage_metadata)
+        self._record_output_length(profile, payload, usage, finish_reason == "MAX_TOKENS")
+        decision = self._parse_llm_output("".join(chunks))
+        decision._usage = usage
+        if not decision.is_fallback:
+            await self.decision_cache.set(cache_key, decision.model_dump())
+            self.semantic_cache.add(scope, cache_key, text, decision.model_dump())
+        yield "complete", decision
+
+    def _record_token_usage(self, usage_metadata: Optional[Dict[str, Any]]) -> Optional[TokenUsage]:
+        """Account the usageMetadata of one upstream response to the current endpoint."""
+        if not usage_metadata:
+            return None
+        usage = TokenUsage.from_metadata(usage_metadata)
+        self.token_usage.record(usage)
+        set_span_attributes({
+            "gen_ai.usage.input_tokens": usage.prompt_tokens,
+            "gen_ai.usage.output_tokens": usage.candidates_tokens,
+            "gen_ai.usage.cached_tokens": usage.cached_tokens,
+        })
+        return usage
+
+    def _decision_events(self, decision: Decision) -> List[Tuple[str, Any]]:
+        """Replay a finished decision as the same events stream_decision emits."""
+        events: List[Tuple[str, Any]] = [("decision", decision.decision), ("confidence", decision.confidence)]
+        events.extend(("reasoning", {"index": i, "text": text}) for i, text in enumerate(decision.reasoning))
+        events.extend(("key_factors", {"factor": k, "explanation": v}) for k, v in decision.key_factors.items())
+        events.append(("complete", decision))
+        return events
+
+    def _estimate_tokens(self, payload: Dict[str, Any]) -> int:
+        """Rough pre-flight token estimate (~4 characters per token) plus the output budget."""
+        prompt_chars = sum(len(part.get("text", "")) for content in payload["contents"] for part in content["parts"])
+        prompt_chars += sum(len(part.get("text", "")) for part in payload.get("systemInstruction", {}).get("parts", []))
+        return prompt_chars // 4 + payload["generationConfig"].get("maxOutputTokens", 0)
+
+    def _profile(self, priority: str) -> GenerationProfile:
+        return self.generation_profiles.get(priority) or self.generation_profiles["medium"]
+
+    def _cache_key(self, prompt: str, payload: Dict[str, Any], profile: GenerationProfile) -> str:
+        # The output budget changes as the predictor learns; it must not split the cache
+        generation_config = {k: v for k, v in payload["generationConfig"].items() if k != "maxOutputTokens"}
+        generation_config["profile"] = profile.name
+        return make_cache_key(prompt, generation_config, self.api_url, self.prompt_template.id)
+
+    def _semantic_scope(self, payload: Dict[str, Any], profile: GenerationProfile) -> str:
+        # Everything in the exact key except the prompt: only requests for the same model,
+        # template and generation settings may share a decision
+        return self._cache_key("", payload, profile)
+
+    def _semantic_text(self, task_description: str, context: Dict[str, Any]) -> str:
+        # The request itself, not the rendered prompt, whose template text every request shares
+        return f"{task_description}\n{render_context(context)}"
+
+    def _semantic_lookup(self, scope: str, text: str) -> Optional[Decision]:
+        """A decision made for a near-duplicate request, when the semantic cache has one."""
+        match = self.semantic_cache.lookup(scope, text)
+        set_span_attributes({"agent.semantic_cache_hit": match is not None})
+        if match is None:
+            return None
+        value, similarity = match
+        set_span_attributes({"agent.semantic_cache_similarity": round(similarity, 4)})
+        logger.info(f"🧭 Reusing the decision of a similar request (similarity {similarity:.3f})")
+        return Decision(**value)
+
+    def _record_output_length(
+        self, profile: GenerationProfile, payload: Dict[str, Any], usage: Optional[TokenUsage], truncated: bool
+    ) -> None:
+        if usage is None:
+            return
+        self.output_predictor.record(
+            profile.name, usage.candidates_tokens, payload["generationConfig"]["maxOutputTokens"], truncated
+        )
+
+    def _with_output_budget(self, payload: Dict[str, Any], max_output_tokens: int) -> Dict[str, Any]:
+        return {**payload, "generationConfig": {**payload["generationConfig"], "maxOutputTokens": max_output_tokens}}
+
+    def _build_payload(self, prompt: str, profile: Optional[GenerationProfile] = None) -> Dict[str, Any]:
+        profile = profile or self._profile("medium")
+        generation_config: Dict[str, Any] = {
+            "temperature": profile.temperature,
+            "maxOutputTokens": self.output_predictor.predict(profile)
+        }
+        if self.structured_output:
+            generation_config["responseMimeType"] = "application/json"
+            generation_config["responseSchema"] = DECISION_RESPONSE_SCHEMA
+        payload: Dict[str, Any] = {
+            "contents": [{
+                "role": "user",
+                "parts": [{"text": prompt}]
+            }],
+            "generationConfig": generation_config
+        }
+        if self.prompt_template.system_instruction:
+            payload["systemInstruction"] = {"parts": [{"text": self.prompt_template.system_instruction}]}
+        return payload
 
     def _create_structured_prompt(self, task_description: str, context: Dict[str, Any]) -> str:
-        context_str = "\n".join([f"- {key}: {value}" for key, value in context.items()])
-        
-        return f"""You are an expert decision-making AI. Analyze the following task and provide a structured decision.
-
-**TASK:**
-{task_description}
-
-**CONTEXT:**
-{context_str if context else 'No context provided.'}
-
-Please provide your response in the following JSON format:
-{{
-  "decision": "Your clear and specific recommendation",
-  "confidence": <your_confidence_score_between_0.0_and_1.0>,
-  "reasoning": [
-    "First key point of analysis",
-    "Second important consideration", 
-    "Third supporting argument"
-  ],
-  "key_factors": {{
-    "Factor 1": "Explanation of how this impacts the decision",
-    "Factor 2": "Analysis of this consideration",
-    "Factor 3": "Assessment of this element"
-  }}
-}}
-
-IMPORTANT: Replace <your_confidence_score_between_0.0_and_1.0> with an actual decimal between 0.0 and 1.0 based on your analysis. Higher confidence (0.8-1.0) for clear, well-supported decisions. Lower confidence (0.3-0.7) for complex or uncertain situations. Very low confidence (0.1-0.3) for highly uncertain scenarios.
-
-Provide practical, actionable advice with confidence scores that reflect the certainty of your recommendation."""
+        # Static instructions live in the precompiled template's system instruction
+        with start_span("IntelligentAgent._create_structured_prompt"):
+            return self.prompt_template.render(task=task_description, context=render_context(context))
 
     def _parse_llm_output(self, output: str) -> Decision:
+        with start_span("IntelligentAgent._parse_llm_output", {"agent.output_chars": len(output)}):
+            return self._parse_decision(output)
+
+    def _parse_decision(self, output: str) -> Decision:
+        if self.structured_output:
+            # Schema-constrained output is plain JSON; parse and validate it in one pass
+            try:
+                with STAGE_SECONDS.time("validation"):
+                    return Decision.model_validate_json(output)
+            except ValidationError:
+                pass
+
         try:
-            # Try to find JSON block first
-            json_match = re.search(r'```json\n(.*?)\n```', output, re.S)
-            if json_match:
-                json_str = json_match.group(1).strip()
-            else:
-                # Try to find JSON without code block
-                start_idx = output.find('{')
-                end_idx = output.rfind('}') + 1
-                if start_idx != -1 and end_idx != 0:
-                    json_str = output[start_idx:end_idx]
-                else:
-                    raise ValueError("No JSON found in response")
-            
-            data = json.loads(json_str)
+            with STAGE_SECONDS.time("json_parse"):
+                data = extract_json(output, DECISION_FIELDS)
             
             # Validate required fields
-            if not all(key in data for key in ["decision", "confidence", "reasoning", "key_factors"]):
+            if not all(key in data for key in DECISION_FIELDS):
                 raise ValueError("Missing required fields in JSON response")
                 
-            return Decision(**data)
+            with STAGE_SECONDS.time("validation"):
+                return Decision(**data)
             
-        except (json.JSONDecodeError, ValueError, TypeError, KeyError) as e:
-            logger.error(f"💥 Failed to parse Google Gemini output JSON: {e}\nOutput was: {output}")
+        except (ValueError, TypeError, KeyError) as e:
+            logger.error(f"💥 Failed to parse Google Gemini output JSON: {e}\nOutput was: {preview(output)}")
             return self._fallback_decision(f"Invalid JSON structure in Google Gemini response: {e}")
 
     def _fallback_decision(self, reason: str) -> Decision:
         logger.warning(f"Executing fallback decision logic due to: {reason}")
+        FALLBACKS.inc(fallback_reason_label(reason))
         
         if "not configured" in reason.lower() or "demo" in reason.lower():
-            return Decision(
+            decision = Decision(
                 decision="Demo response: Consider gathering more information and consulting with stakeholders before making this decision.",
                 confidence=0.8,
                 reasoning=[
@@ -163,19 +782,21 @@ Provide practical, actionable advice with confidence scores that reflect the cer
                 }
             )
         else:
-            return Decision(
+            decision = Decision(
                 decision="A decision could not be reached due to a system error.",
                 confidence=0.0,
                 reasoning=["Google Gemini AI failed to provide a valid response.", f"Error: {reason}"],
                 key_factors={"System Status": "An internal error occurred.", "Error Details": reason}
             )
+        decision._fallback_reason = reason
+        return decision
 
 if __name__ == '__main__':
     # This allows for direct testing of the agent
     async def main():
         print("🤖 Initializing agent for a test run...")
         try:
-            agent = IntelligentAgent.get_instance()
+            agent = IntelligentAgent()
             print("✅ Agent initialized successfully.")
             
             task = "Should our company migrate our primary database from PostgreSQL to a distributed SQL database like CockroachDB?"
@@ -192,6 +813,7 @@ if __name__ == '__main__':
             
             print("\n🎉 Decision received:")
             print(decision.model_dump_json(indent=2))
+            await agent.close()
             
         except Exception as e:
             print(f"🔥 An error occurred during the test run: {e}")
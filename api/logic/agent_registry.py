@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    from .agent_logic import IntelligentAgent
+    from .model_backends import backend_config_key
+except ImportError:
+    # Fallback for running this module directly
+    from agent_logic import IntelligentAgent
+    from model_backends import backend_config_key
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class AgentRegistry:
+    """
+    One IntelligentAgent per event loop and backend configuration.
+
+    An agent's httpx client, locks and in-flight futures belong to the loop that
+    created them, so each loop (a worker, a test loop, a thread with its own
+    loop) gets its own agent and connection pool. Within a loop the agent is
+    reused for the life of the app. get() builds the agent synchronously, so
+    concurrent first requests on one loop cannot construct duplicates; the lock
+    covers callers on other threads. Agents are dropped with their loop, and
+    close() releases those of the running loop at shutdown.
+    """
+
+    def __init__(self, factory: Callable[[], IntelligentAgent] = IntelligentAgent):
+        self.factory = factory
+        self._agents: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, IntelligentAgent]]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def get(self) -> IntelligentAgent:
+        """The agent for the running loop and current backend configuration. Call from async code."""
+        loop = asyncio.get_running_loop()
+        key = backend_config_key()
+        agents = self._agents.get(loop)
+        agent = agents.get(key) if agents is not None else None
+        if agent is not None:
+            return agent
+        with self._lock:
+            agents = self._agents.setdefault(loop, {})
+            agent = agents.get(key)
+            if agent is None:
+                agent = agents[key] = self.factory()
+                self.created += 1
+                logger.info(f"✅ Agent created for event loop {id(loop):#x} ({len(agents)} configuration(s))")
+        return agent
+
+    def loaded(self) -> List[IntelligentAgent]:
+        """Agents already built for the running loop, without building one."""
+        agents = self._agents.get(asyncio.get_running_loop())
+        return list(agents.values()) if agents else []
+
+    async def close(self) -> None:
+        """Close the agents of the running loop and forget them."""
+        with self._lock:
+            agents = self._agents.pop(asyncio.get_running_loop(), {})
+        for agent in agents.values():
+            await agent.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loops": len(self._agents),
+            "agents": sum(len(agents) for agents in list(self._agents.values())),
+            "created": self.created,
+        }
+
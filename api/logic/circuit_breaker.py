@@ -0,0 +1,157 @@
+import os
+import time
+import logging
+from collections import deque
+from typing import Any, Dict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for the upstream model.
+
+    While closed, call outcomes are tracked over a rolling time window. The
+    breaker opens when, over at least min_calls calls, the error rate or the
+    share of calls slower than slow_call_seconds crosses its threshold. While
+    open every request is refused immediately; after open_seconds it turns
+    half-open and lets a few probe calls through, closing again if they all
+    succeed and re-opening on the first failure.
+    """
+
+    def __init__(
+        self,
+        error_rate_threshold: float = 0.5,
+        slow_call_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        min_calls: int = 10,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 2,
+        enabled: bool = True,
+    ):
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.enabled = enabled
+        self.state = CLOSED
+        self.opened_at = 0.0
+        # (timestamp, failed, slow) per completed call
+        self._calls: deque = deque()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            error_rate_threshold=float(os.getenv("CIRCUIT_ERROR_RATE_THRESHOLD", "0.5")),
+            slow_call_rate_threshold=float(os.getenv("CIRCUIT_SLOW_CALL_RATE_THRESHOLD", "0.5")),
+            slow_call_seconds=float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "20")),
+            min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "10")),
+            window_seconds=float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60")),
+            open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+            half_open_max_calls=int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "2")),
+            enabled=os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() not in ("0", "false", "no"),
+        )
+
+    def allow_request(self) -> bool:
+        if not self.enabled:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def record_success(self, latency: float) -> None:
+        self._record(failed=False, latency=latency)
+
+    def record_failure(self, latency: float) -> None:
+        self._record(failed=True, latency=latency)
+
+    def release(self) -> None:
+        """Give back an admitted call that never reached the upstream (e.g. shed locally)."""
+        if self.enabled and self.state == HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def _record(self, failed: bool, latency: float) -> None:
+        if not self.enabled:
+            return
+        slow = latency >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            if failed or slow:
+                self._transition(OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_max_calls:
+                self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            # A call admitted before the breaker opened has finished; nothing to decide
+            return
+
+        now = time.monotonic()
+        self._calls.append((now, failed, slow))
+        horizon = now - self.window_seconds
+        while self._calls and self._calls[0][0] < horizon:
+            self._calls.popleft()
+        if len(self._calls) < self.min_calls:
+            return
+        error_rate = sum(1 for _, f, _ in self._calls if f) / len(self._calls)
+        slow_rate = sum(1 for _, _, s in self._calls if s) / len(self._calls)
+        if error_rate >= self.error_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            logger.error(
+                f"⚡ Circuit breaker opening: error rate {error_rate:.0%}, slow call rate {slow_rate:.0%} "
+                f"over the last {len(self._calls)} calls"
+            )
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning(f"⚡ Circuit breaker {self.state} -> {state}")
+        self.state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == CLOSED:
+            self._calls.clear()
+
+    def open_remaining(self) -> float:
+        """Seconds until an open breaker lets a probe through; 0 when not open."""
+        if self.state != OPEN:
+            return 0.0
+        return max(self.open_seconds - (time.monotonic() - self.opened_at), 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = len(self._calls)
+        failures = sum(1 for _, f, _ in self._calls if f)
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "window_calls": calls,
+            "window_error_rate": round(failures / calls, 4) if calls else 0.0,
+            "open_for_seconds": round(self.open_remaining(), 2),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
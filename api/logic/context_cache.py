@@ -0,0 +1,169 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class CachedContentEntry:
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class ContextCacheManager:
+    """
+    Lifecycle manager for Gemini cachedContents holding static prompt instructions.
+
+    For each (backend, template) pair it creates a cachedContents resource on
+    first use, extends its TTL shortly before it expires, and deletes it on
+    shutdown. Requests then reference the resource by name instead of resending
+    the instructions. Creation failures (for example a prompt below the model's
+    minimum cacheable size) disable caching for that pair for a back-off period,
+    and callers fall back to sending the instructions inline.
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        ttl_seconds: float = 3600.0,
+        refresh_margin_seconds: float = 300.0,
+        failure_backoff_seconds: float = 600.0,
+        enabled: bool = False,
+    ):
+        self.http_client = http_client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.failure_backoff_seconds = failure_backoff_seconds
+        self.enabled = enabled
+        self._entries: Dict[Tuple[str, str], CachedContentEntry] = {}
+        self._failed_until: Dict[Tuple[str, str], float] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self.created = 0
+        self.refreshed = 0
+        self.failures = 0
+        self.references = 0
+
+    @classmethod
+    def from_env(cls, http_client: httpx.AsyncClient) -> "ContextCacheManager":
+        return cls(
+            http_client,
+            ttl_seconds=float(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600")),
+            refresh_margin_seconds=float(os.getenv("GEMINI_CONTEXT_CACHE_REFRESH_MARGIN", "300")),
+            failure_backoff_seconds=float(os.getenv("GEMINI_CONTEXT_CACHE_FAILURE_BACKOFF", "600")),
+            enabled=os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes"),
+        )
+
+    @staticmethod
+    def _api_base(backend) -> str:
+        return backend.api_url.split("/models/", 1)[0]
+
+    @staticmethod
+    def _model_name(backend) -> str:
+        return backend.api_url.split("/models/", 1)[-1].split(":", 1)[0]
+
+    def _url(self, backend, path: str) -> str:
+        url = f"{self._api_base(backend)}/{path}"
+        return f"{url}?key={backend.api_key}" if backend.api_key else url
+
+    async def get(self, backend, template) -> Optional[str]:
+        """Return the cachedContents name to reference for this backend and template, or None."""
+        if not self.enabled or not template.system_instruction:
+            return None
+        key = (backend.name, template.id)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at - now > self.refresh_margin_seconds:
+            self.references += 1
+            return entry.name
+        if self._failed_until.get(key, 0.0) > now:
+            return None
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another request may have created or refreshed it while we waited
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and entry.expires_at - now > self.refresh_margin_seconds:
+                self.references += 1
+                return entry.name
+            try:
+                if entry is not None and entry.expires_at > now:
+                    entry = await self._refresh(backend, entry)
+                else:
+                    entry = await self._create(backend, template)
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                self.failures += 1
+                self._entries.pop(key, None)
+                self._failed_until[key] = time.monotonic() + self.failure_backoff_seconds
+                logger.warning(
+                    f"Context caching unavailable for {template.id} on backend '{backend.name}': {e!r}. "
+                    f"Sending instructions inline for {self.failure_backoff_seconds:.0f}s."
+                )
+                return None
+            self._entries[key] = entry
+            self.references += 1
+            return entry.name
+
+    async def _create(self, backend, template) -> CachedContentEntry:
+        body = {
+            "model": f"models/{self._model_name(backend)}",
+            "displayName": template.id,
+            "systemInstruction": {"parts": [{"text": template.system_instruction}]},
+            "ttl": f"{int(self.ttl_seconds)}s",
+        }
+        response = await self.http_client.post(self._url(backend, "cachedContents"), json=body)
+        response.raise_for_status()
+        name = response.json()["name"]
+        self.created += 1
+        logger.info(f"✅ Created cached content {name} for {template.id} on backend '{backend.name}'")
+        return CachedContentEntry(name, time.monotonic() + self.ttl_seconds)
+
+    async def _refresh(self, backend, entry: CachedContentEntry) -> CachedContentEntry:
+        response = await self.http_client.patch(
+            self._url(backend, entry.name),
+            params={"updateMask": "ttl"},
+            json={"ttl": f"{int(self.ttl_seconds)}s"},
+        )
+        response.raise_for_status()
+        self.refreshed += 1
+        return CachedContentEntry(entry.name, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, backend, template) -> None:
+        """Forget a cache the server no longer accepts and stop using it for a while."""
+        key = (backend.name, template.id)
+        self._entries.pop(key, None)
+        self._failed_until[key] = time.monotonic() + self.failure_backoff_seconds
+
+    def apply(self, payload: Dict[str, Any], cached_content: str) -> Dict[str, Any]:
+        """Copy of a request payload that references cached instructions instead of inlining them."""
+        request = {key: value for key, value in payload.items() if key != "systemInstruction"}
+        request["cachedContent"] = cached_content
+        return request
+
+    async def close(self, backends) -> None:
+        """Delete every cachedContents resource this process created."""
+        by_name = {backend.name: backend for backend in backends}
+        for (backend_name, _), entry in list(self._entries.items()):
+            backend = by_name.get(backend_name)
+            if backend is None:
+                continue
+            try:
+                await self.http_client.delete(self._url(backend, entry.name))
+            except httpx.HTTPError as e:
+                logger.warning(f"Could not delete cached content {entry.name}: {e!r}")
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "active": len(self._entries),
+            "created": self.created,
+            "refreshed": self.refreshed,
+            "references": self.references,
+            "failures": self.failures,
+        }
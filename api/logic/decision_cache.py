@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+
+try:
+    from .metrics import DECISION_CACHE_LOOKUPS
+except ImportError:
+    # Fallback for running this module directly
+    from metrics import DECISION_CACHE_LOOKUPS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(prompt: str, generation_config: Dict[str, Any], model: str, template: str = "") -> str:
+    """
+    Canonical content hash of everything that determines a model response.
+    template identifies the static instructions sent alongside the prompt.
+    """
+    canonical = json.dumps(
+        {"model": model, "template": template, "prompt": prompt, "generationConfig": generation_config},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CacheTier:
+    """
+    Base class for a decision cache tier. Values are plain JSON-compatible dicts
+    so that every tier can store them without knowing about the Decision model.
+    """
+    name = "tier"
+    # Runs the calls of tiers that block (disk, network) off the event loop; None runs them inline
+    executor: Optional[ThreadPoolExecutor] = None
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the tier's connection and thread, if it has any."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class MemoryCacheTier(CacheTier):
+    """In-process LRU cache with a per-entry TTL."""
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheTier(CacheTier):
+    """
+    On-disk cache tier so decisions survive restarts and are shared between workers.
+
+    Calls run on the tier's own single thread. Expired and least recently used
+    rows are trimmed every trim_interval writes rather than on each one, so the
+    table may briefly hold up to trim_interval rows over max_entries.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl_seconds: float = 86400.0,
+                 trim_interval: Optional[int] = None):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.trim_interval = trim_interval or min(max(max_entries // 100, 1), 1000)
+        self._writes = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decision-cache-sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS decisions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_decisions_accessed ON decisions(accessed_at)")
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM decisions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM decisions WHERE key = ?", (key,))
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE decisions SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO decisions (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl_seconds, now),
+            )
+            self._writes += 1
+            if self._writes >= self.trim_interval:
+                self._writes = 0
+                self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        self.expirations += self._conn.execute("DELETE FROM decisions WHERE expires_at < ?", (now,)).rowcount
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+        overflow = self._rows - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM decisions WHERE key IN "
+                "(SELECT key FROM decisions ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+            self._rows = self.max_entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM decisions")
+            self._rows = 0
+
+    def __len__(self) -> int:
+        # Row count as of the last trim; counting on every call would scan the table
+        return self._rows
+
+    def close(self) -> None:
+        # Let queued calls finish first; they still need the connection
+        self.executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+
+class DecisionCache:
+    """
+    Tiered, content-addressed cache for model decisions.
+
+    Lookups go through the tiers in order; a hit in a slower tier is promoted
+    into every faster tier in front of it. Tiers with an executor are called
+    through it, so disk I/O never runs on the event loop.
+    """
+
+    def __init__(self, tiers: Optional[list] = None, enabled: bool = True):
+        self.tiers = tiers if tiers is not None else [MemoryCacheTier()]
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "DecisionCache":
+        enabled = os.getenv("DECISION_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        ttl = float(os.getenv("DECISION_CACHE_TTL_SECONDS", "3600"))
+        tiers: list = [MemoryCacheTier(
+            max_entries=int(os.getenv("DECISION_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=ttl,
+        )]
+        db_path = os.getenv("DECISION_CACHE_DB_PATH")
+        if enabled and db_path:
+            try:
+                tiers.append(SQLiteCacheTier(
+                    db_path,
+                    max_entries=int(os.getenv("DECISION_CACHE_DB_MAX_ENTRIES", "100000")),
+                    ttl_seconds=float(os.getenv("DECISION_CACHE_DB_TTL_SECONDS", str(ttl))),
+                ))
+                logger.info(f"✅ Decision cache disk tier enabled at {db_path}")
+            except sqlite3.Error as e:
+                logger.error(f"💥 Could not open decision cache database {db_path}: {e}")
+        return cls(tiers=tiers, enabled=enabled)
+
+    async def _call(self, tier: CacheTier, method: Callable, *args: Any) -> Any:
+        if tier.executor is None:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(tier.executor, method, *args)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        for index, tier in enumerate(self.tiers):
+            value = await self._call(tier, tier.get, key)
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    await self._call(faster, faster.set, key, value)
+                self.hits += 1
+                DECISION_CACHE_LOOKUPS.inc("hit", tier.name)
+                return value
+        self.misses += 1
+        DECISION_CACHE_LOOKUPS.inc("miss", "none")
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        for tier in self.tiers:
+            await self._call(tier, tier.set, key, value)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+    async def close(self) -> None:
+        """Close every tier; waiting for a tier's executor to drain happens off the event loop."""
+        for tier in self.tiers:
+            if tier.executor is None:
+                tier.close()
+            else:
+                await asyncio.get_running_loop().run_in_executor(None, tier.close)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": sum(tier.evictions for tier in self.tiers),
+            "tiers": {tier.name: tier.stats() for tier in self.tiers},
+        }
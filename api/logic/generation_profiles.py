@@ -0,0 +1,133 @@
+import os
+import json
+import math
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class GenerationProfile:
+    """
+    Generation settings for one request priority.
+
+    max_output_tokens is the ceiling; the predictor may send less. cost_weight
+    overrides the router's cost term, so a large value steers the request to the
+    cheapest configured backend and 0 ignores cost. None keeps the router default.
+    """
+
+    def __init__(self, name: str, temperature: float = 0.7, max_output_tokens: int = 1000,
+                 cost_weight: Optional[float] = None):
+        self.name = name
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+        self.cost_weight = cost_weight
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_output_tokens,
+            "cost_weight": self.cost_weight,
+        }
+
+
+DEFAULT_PROFILES: Dict[str, Dict[str, Any]] = {
+    "low": {"temperature": 0.5, "max_output_tokens": 512, "cost_weight": 5.0},
+    "medium": {"temperature": 0.7, "max_output_tokens": 1000},
+    "high": {"temperature": 0.7, "max_output_tokens": 2048, "cost_weight": 0.0},
+}
+
+
+def load_profiles() -> Dict[str, GenerationProfile]:
+    """
+    Profiles per priority. GENERATION_PROFILES (JSON) overrides fields of the
+    defaults or adds priorities, e.g. {"low": {"max_output_tokens": 384}}.
+    """
+    configs = {name: dict(config) for name, config in DEFAULT_PROFILES.items()}
+    raw = os.getenv("GENERATION_PROFILES")
+    if raw:
+        try:
+            for name, overrides in json.loads(raw).items():
+                configs.setdefault(name, {}).update(overrides)
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.error(f"💥 Ignoring invalid GENERATION_PROFILES ({e}); using the default profiles")
+    return {name: GenerationProfile(name, **config) for name, config in configs.items()}
+
+
+class OutputLengthPredictor:
+    """
+    Learns how many output tokens each profile needs from observed usageMetadata.
+
+    The budget is a high quantile of recent candidatesTokenCount values times a
+    headroom factor, clamped between floor and the profile ceiling. Until
+    min_samples responses have been seen the ceiling is used. A response cut off
+    at the limit is recorded at twice its budget, so the estimate grows quickly.
+    """
+    RECOMPUTE_EVERY = 10
+
+    def __init__(self, window: int = 500, quantile: float = 0.99, headroom: float = 1.25,
+                 min_samples: int = 30, floor: int = 256, enabled: bool = True):
+        self.window = window
+        self.quantile = quantile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.floor = floor
+        self.enabled = enabled
+        self._samples: Dict[str, Deque[int]] = {}
+        self._truncations: Dict[str, int] = {}
+        # Estimates are recomputed every RECOMPUTE_EVERY samples, not on every request
+        self._estimates: Dict[str, Optional[int]] = {}
+        self._since_estimate: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "OutputLengthPredictor":
+        return cls(
+            window=int(os.getenv("OUTPUT_PREDICTOR_WINDOW", "500")),
+            quantile=float(os.getenv("OUTPUT_PREDICTOR_QUANTILE", "0.99")),
+            headroom=float(os.getenv("OUTPUT_PREDICTOR_HEADROOM", "1.25")),
+            min_samples=int(os.getenv("OUTPUT_PREDICTOR_MIN_SAMPLES", "30")),
+            floor=int(os.getenv("OUTPUT_PREDICTOR_FLOOR", "256")),
+            enabled=os.getenv("GENERATION_ADAPTIVE_MAX_TOKENS", "true").lower() not in ("0", "false", "no"),
+        )
+
+    def record(self, profile: str, output_tokens: int, budget: int, truncated: bool = False) -> None:
+        if truncated:
+            self._truncations[profile] = self._truncations.get(profile, 0) + 1
+            output_tokens = max(output_tokens, budget) * 2
+        samples = self._samples.setdefault(profile, deque(maxlen=self.window))
+        samples.append(output_tokens)
+        pending = self._since_estimate.get(profile, 0) + 1
+        if truncated or pending >= self.RECOMPUTE_EVERY or len(samples) == self.min_samples:
+            self._estimates[profile] = self._estimate(profile)
+            pending = 0
+        self._since_estimate[profile] = pending
+
+    def _estimate(self, profile: str) -> Optional[int]:
+        samples = self._samples.get(profile)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        value = ordered[min(int(self.quantile * len(ordered)), len(ordered) - 1)]
+        return math.ceil(value * self.headroom)
+
+    def predict(self, profile: GenerationProfile) -> int:
+        """maxOutputTokens to request for the next call with this profile."""
+        estimate = self._estimates.get(profile.name) if self.enabled else None
+        if estimate is None:
+            return profile.max_output_tokens
+        return max(min(estimate, profile.max_output_tokens), min(self.floor, profile.max_output_tokens))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "profiles": {
+                name: {
+                    "samples": len(samples),
+                    "predicted_budget": self._estimates.get(name),
+                    "truncations": self._truncations.get(name, 0),
+                }
+                for name, samples in self._samples.items()
+            },
+        }
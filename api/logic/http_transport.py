@@ -0,0 +1,109 @@
+import os
+import asyncio
+import logging
+import importlib.util
+from typing import Optional
+from urllib.parse import urlsplit
+import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() not in ("0", "false", "no")
+
+
+class TransportSettings:
+    """Connection pool, protocol and timeout settings for the upstream model client."""
+
+    def __init__(
+        self,
+        max_connections: int = 200,
+        max_keepalive_connections: int = 50,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 45.0,
+        write_timeout: float = 10.0,
+        pool_timeout: float = 5.0,
+        warmup_connections: int = 2,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+        self.warmup_connections = warmup_connections
+
+    @classmethod
+    def from_env(cls) -> "TransportSettings":
+        return cls(
+            max_connections=int(os.getenv("GEMINI_HTTP_MAX_CONNECTIONS", "200")),
+            max_keepalive_connections=int(os.getenv("GEMINI_HTTP_MAX_KEEPALIVE", "50")),
+            keepalive_expiry=float(os.getenv("GEMINI_HTTP_KEEPALIVE_EXPIRY", "30")),
+            http2=_env_bool("GEMINI_HTTP2", True),
+            connect_timeout=float(os.getenv("GEMINI_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("GEMINI_READ_TIMEOUT", "45")),
+            write_timeout=float(os.getenv("GEMINI_WRITE_TIMEOUT", "10")),
+            pool_timeout=float(os.getenv("GEMINI_POOL_TIMEOUT", "5")),
+            warmup_connections=int(os.getenv("GEMINI_HTTP_WARMUP_CONNECTIONS", "2")),
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (installed by httpx[http2])."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_http_client(settings: Optional[TransportSettings] = None) -> httpx.AsyncClient:
+    settings = settings or TransportSettings.from_env()
+    http2 = settings.http2
+    if http2 and not http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+        http2 = False
+    return httpx.AsyncClient(timeout=settings.timeout, limits=settings.limits, http2=http2)
+
+
+async def warm_up(client: httpx.AsyncClient, url: str, connections: int = 2) -> int:
+    """
+    Open connections to the upstream origin ahead of the first real request, so
+    the DNS lookup and TLS handshake are not paid on the request path.
+
+    Returns the number of warm-up requests that reached the server.
+    """
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}/"
+
+    async def probe() -> bool:
+        try:
+            await client.head(origin)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Connection warm-up to {origin} failed: {e}")
+            return False
+
+    results = await asyncio.gather(*(probe() for _ in range(max(connections, 0))))
+    warmed = sum(results)
+    logger.info(f"✅ Warmed {warmed}/{len(results)} upstream connections to {origin}")
+    return warmed
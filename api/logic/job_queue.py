@@ -0,0 +1,483 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pydantic import BaseModel
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+
+class Job(BaseModel):
+    id: str
+    status: str = "queued"
+    payload: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue already holds max_pending jobs."""
+
+
+class JobStore:
+    """
+    Base class for job persistence. A store keeps jobs in submission order and
+    hands each queued job to exactly one caller of claim().
+    """
+    name = "store"
+    # Runs the calls of stores that block (disk, lock waits) off the event loop; None runs them inline
+    executor: Optional[ThreadPoolExecutor] = None
+
+    def put(self, job: Job) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    def claim(self) -> Optional[Job]:
+        """Mark the oldest queued job as running and return it."""
+        raise NotImplementedError
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def requeue(self, job_ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def requeue_stale(self, started_before: float) -> int:
+        """Requeue running jobs whose worker has gone away, e.g. after a crash."""
+        raise NotImplementedError
+
+    def purge(self, finished_before: float) -> int:
+        raise NotImplementedError
+
+    def pending(self) -> int:
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the store's connection and thread, if it has any."""
+
+
+class MemoryJobStore(JobStore):
+    """Jobs held in this process only; they are lost on restart."""
+    name = "memory"
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queued: "OrderedDict[str, None]" = OrderedDict()
+
+    def put(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        self._queued[job.id] = None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def claim(self) -> Optional[Job]:
+        if not self._queued:
+            return None
+        job_id, _ = self._queued.popitem(last=False)
+        job = self._jobs[job_id]
+        job.status = "running"
+        job.started_at = time.time()
+        job.attempts += 1
+        return job
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.status = "failed" if error is not None else "succeeded"
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+
+    def requeue(self, job_ids: List[str]) -> None:
+        for job_id in job_ids:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == "running":
+                job.status = "queued"
+                job.started_at = None
+                self._queued[job_id] = None
+                self._queued.move_to_end(job_id, last=False)
+
+    def requeue_stale(self, started_before: float) -> int:
+        stale = [job.id for job in self._jobs.values()
+                 if job.status == "running" and (job.started_at or 0.0) < started_before]
+        self.requeue(stale)
+        return len(stale)
+
+    def purge(self, finished_before: float) -> int:
+        expired = [job.id for job in self._jobs.values()
+                   if job.finished and (job.finished_at or 0.0) < finished_before]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    def pending(self) -> int:
+        return len(self._queued)
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+
+class SQLiteJobStore(JobStore):
+    """
+    On-disk job store; jobs survive restarts and can be polled from any worker process.
+
+    Calls run on the store's own single thread, so a write lock held by another
+    process (up to busy_timeout) delays job bookkeeping but never the event loop.
+    """
+    name = "sqlite"
+
+    _COLUMNS = "id, status, payload, result, error, attempts, created_at, started_at, finished_at"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store-sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, result TEXT, error TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)")
+
+    def _row_to_job(self, row) -> Job:
+        job_id, status, payload, result, error, attempts, created_at, started_at, finished_at = row
+        return Job(
+            id=job_id,
+            status=status,
+            payload=json.loads(payload),
+            result=json.loads(result) if result is not None else None,
+            error=error,
+            attempts=attempts,
+            created_at=created_at,
+            started_at=started_at,
+            finished_at=finished_at,
+        )
+
+    def put(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({self._COLUMNS}) VALUES (?, ?, ?, NULL, NULL, 0, ?, NULL, NULL)",
+                (job.id, job.status, json.dumps(job.payload), job.created_at),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def claim(self) -> Optional[Job]:
+        now = time.time()
+        with self._lock:
+            # Idle workers poll often; only take the write lock when there is work
+            if self._conn.execute("SELECT 1 FROM jobs WHERE status = 'queued' LIMIT 1").fetchone() is None:
+                return None
+            # IMMEDIATE takes the write lock up front, so two processes cannot claim the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT {self._COLUMNS} FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = self._row_to_job(row)
+        job.status, job.started_at, job.attempts = "running", now, job.attempts + 1
+        return job
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (
+                    "failed" if error is not None else "succeeded",
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def requeue(self, job_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE id = ? AND status = 'running'",
+                [(job_id,) for job_id in job_ids],
+            )
+
+    def requeue_stale(self, started_before: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running' AND started_at < ?",
+                (started_before,),
+            )
+        return cursor.rowcount
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (finished_before,),
+            )
+        return cursor.rowcount
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        with self._lock:
+            for status, count in self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = count
+        return counts
+
+    def close(self) -> None:
+        # Let queued calls finish first; they still need the connection
+        self.executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Asynchronous job queue with an in-process worker pool.
+
+    submit() stores the job and returns immediately; worker tasks on the event
+    loop claim queued jobs from the store and run them through the handler.
+    Jobs left running by a worker that died are requeued once their lease
+    expires, and finished jobs are purged after result_ttl_seconds. stop()
+    drains: workers stop claiming, running jobs get drain_seconds to finish,
+    and only the ones still running after that are cancelled and requeued.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        store: Optional[JobStore] = None,
+        workers: int = 8,
+        max_pending: int = 10000,
+        job_timeout: float = 120.0,
+        lease_seconds: float = 300.0,
+        result_ttl_seconds: float = 3600.0,
+        poll_interval: float = 0.5,
+        drain_seconds: float = 30.0,
+    ):
+        self.handler = handler
+        self.store = store if store is not None else MemoryJobStore()
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_timeout = job_timeout
+        self.lease_seconds = lease_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.poll_interval = poll_interval
+        self.drain_seconds = drain_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._in_flight: Dict[str, float] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]) -> "JobQueue":
+        store: JobStore = MemoryJobStore()
+        db_path = os.getenv("JOB_QUEUE_DB_PATH")
+        if db_path:
+            try:
+                store = SQLiteJobStore(db_path)
+                logger.info(f"✅ Job queue persisted at {db_path}")
+            except sqlite3.Error as e:
+                logger.error(f"💥 Could not open job queue database {db_path}: {e}. Using in-memory jobs.")
+        return cls(
+            handler,
+            store=store,
+            workers=int(os.getenv("JOB_QUEUE_WORKERS", "8")),
+            max_pending=int(os.getenv("JOB_QUEUE_MAX_PENDING", "10000")),
+            job_timeout=float(os.getenv("JOB_TIMEOUT_SECONDS", "120")),
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "300")),
+            result_ttl_seconds=float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600")),
+            poll_interval=float(os.getenv("JOB_QUEUE_POLL_INTERVAL", "0.5")),
+            # In-memory jobs die with the process, so running ones get the same grace as requests
+            drain_seconds=float(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "30")),
+        )
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Start the worker pool on the running event loop; a no-op if already started."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+        logger.info(f"✅ Job queue started with {self.workers} workers ({self.store.name} store)")
+
+    async def stop(self) -> None:
+        """
+        Stop claiming jobs, give running ones up to drain_seconds to finish, then
+        cancel the rest and put them back in the queue.
+        """
+        if not self._tasks:
+            return
+        *workers, maintainer = self._tasks
+        self._stopping = True
+        # Wake idle workers so they see the flag and exit
+        self._wakeup.set()
+        maintainer.cancel()
+        if self._in_flight:
+            logger.info(f"⏳ Waiting up to {self.drain_seconds}s for {len(self._in_flight)} running jobs")
+        if workers:
+            _, unfinished = await asyncio.wait(workers, timeout=self.drain_seconds)
+            for task in unfinished:
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def close(self) -> None:
+        """Stop the workers as stop() does, then close the store."""
+        await self.stop()
+        if self.store.executor is None:
+            self.store.close()
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self.store.close)
+
+    async def _call(self, method: Callable, *args: Any) -> Any:
+        if self.store.executor is None:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.store.executor, method, *args)
+
+    async def submit(self, payload: Dict[str, Any]) -> Job:
+        if await self._call(self.store.pending) >= self.max_pending:
+            raise QueueFull(f"Job queue is full ({self.max_pending} pending jobs)")
+        job = Job(id=uuid.uuid4().hex, payload=payload, created_at=time.time())
+        await self._call(self.store.put, job)
+        self.submitted += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self._call(self.store.get, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Poll until the job finishes or timeout seconds pass; returns its latest state."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.finished or remaining <= 0:
+                return job
+            await asyncio.sleep(min(self.poll_interval, remaining))
+
+    async def _worker(self, index: int) -> None:
+        while not self._stopping:
+            # Clear before claiming: a submit that lands while claim() runs sets the event again
+            self._wakeup.clear()
+            claiming = asyncio.ensure_future(self._call(self.store.claim))
+            try:
+                job = await asyncio.shield(claiming)
+            except asyncio.CancelledError:
+                # The claim finishes in the store's thread regardless; put back a job it took
+                job = await claiming
+                if job is not None:
+                    await self._call(self.store.requeue, [job.id])
+                raise
+            if job is not None and self._stopping:
+                # Claimed while stop() began; leave it for the next process
+                await self._call(self.store.requeue, [job.id])
+                return
+            if job is None:
+                # The timeout picks up jobs submitted by other processes sharing the store
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._in_flight[job.id] = time.monotonic()
+            try:
+                result = await asyncio.wait_for(self.handler(job.payload), timeout=self.job_timeout)
+            except asyncio.CancelledError:
+                await self._call(self.store.requeue, [job.id])
+                logger.info(f"↩️ Requeued unfinished job {job.id}")
+                raise
+            except asyncio.TimeoutError:
+                logger.warning(f"⏱️ Job {job.id} timed out after {self.job_timeout}s")
+                await self._call(self.store.finish, job.id, None, f"Timed out after {self.job_timeout}s")
+                self.failed += 1
+            except Exception as e:
+                logger.error(f"💥 Job {job.id} failed: {e}", exc_info=True)
+                await self._call(self.store.finish, job.id, None, str(e))
+                self.failed += 1
+            else:
+                await self._call(self.store.finish, job.id, result)
+                self.completed += 1
+            finally:
+                self._in_flight.pop(job.id, None)
+
+    async def _maintain(self) -> None:
+        while True:
+            try:
+                requeued = await self._call(self.store.requeue_stale, time.time() - self.lease_seconds)
+                if requeued:
+                    logger.warning(f"↩️ Requeued {requeued} jobs whose worker stopped responding")
+                    self._wakeup.set()
+                await self._call(self.store.purge, time.time() - self.result_ttl_seconds)
+            except sqlite3.Error as e:
+                logger.error(f"💥 Job queue maintenance failed: {e}")
+            await asyncio.sleep(min(self.lease_seconds, self.result_ttl_seconds) / 4)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "store": self.store.name,
+            "workers": self.workers,
+            "in_flight": len(self._in_flight),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "jobs": await self._call(self.store.counts),
+        }
@@ -0,0 +1,166 @@
+import re
+import json
+import logging
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Prefer a fast JSON backend when one is installed
+try:
+    import orjson
+
+    def _loads(text: str) -> Any:
+        return orjson.loads(text)
+
+    JSON_BACKEND = "orjson"
+    _DECODE_ERRORS: Tuple[type, ...] = (orjson.JSONDecodeError,)
+except ImportError:
+    try:
+        import msgspec
+
+        _decoder = msgspec.json.Decoder()
+
+        def _loads(text: str) -> Any:
+            return _decoder.decode(text)
+
+        JSON_BACKEND = "msgspec"
+        _DECODE_ERRORS = (msgspec.DecodeError,)
+    except ImportError:
+        _loads = json.loads
+        JSON_BACKEND = "json"
+        _DECODE_ERRORS = (json.JSONDecodeError,)
+
+
+class JSONExtractionError(ValueError):
+    """Raised when no usable JSON object can be found in model output."""
+
+
+# Only these characters can change the scanner's state
+_SPECIAL_CHARS = re.compile(r'[{}"\\]')
+
+
+def iter_json_objects(text: str) -> Iterator[str]:
+    """
+    Yield every balanced top-level {...} span in text, in order, in a single
+    linear scan that only visits braces, quotes and backslashes.
+
+    Braces inside JSON strings are ignored, so "{" or "}" in a value does not end
+    the object early. Prose and code fences around the objects are skipped. A
+    stray "{" in prose that is never closed does not hide the objects after it:
+    they are held back under it and yielded once the text ends. A quote after
+    such a brace still opens a string, so a stray '{"' can hide what follows.
+    """
+    # Open braces as (offset, balanced spans closed directly inside it)
+    stack: List[Tuple[int, List[Tuple[int, int]]]] = []
+    in_string = False
+    skip_to = -1
+    for match in _SPECIAL_CHARS.finditer(text):
+        index = match.start()
+        if index < skip_to:
+            # Character escaped by a preceding backslash
+            continue
+        char = text[index]
+        if in_string:
+            if char == "\\":
+                skip_to = index + 2
+            elif char == '"':
+                in_string = False
+        elif char == "{":
+            stack.append((index, []))
+        elif not stack:
+            # Quotes and backslashes in prose between objects mean nothing
+            continue
+        elif char == '"':
+            in_string = True
+        elif char == "}":
+            start, _ = stack.pop()
+            if stack:
+                # Top level only if every brace around it turns out to be prose
+                stack[-1][1].append((start, index + 1))
+            else:
+                yield text[start:index + 1]
+    # Whatever is still open was never closed; the spans inside it are top level
+    for _, spans in stack:
+        for start, end in spans:
+            yield text[start:end]
+
+
+def strip_trailing_commas(text: str) -> str:
+    """Remove commas that directly precede a closing } or ], outside of strings."""
+    out = []
+    pending_comma = -1
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            out.append(char)
+            continue
+        if char == ",":
+            pending_comma = len(out)
+        elif char in "}]" and pending_comma != -1:
+            del out[pending_comma]
+            pending_comma = -1
+        elif char not in " \t\r\n":
+            pending_comma = -1
+            if char == '"':
+                in_string = True
+        out.append(char)
+    return "".join(out)
+
+
+def loads_lenient(candidate: str) -> Any:
+    """Parse JSON, retrying once without trailing commas."""
+    try:
+        return _loads(candidate)
+    except _DECODE_ERRORS:
+        return _loads(strip_trailing_commas(candidate))
+
+
+def extract_json(text: str, required_keys: Iterable[str] = ()) -> dict:
+    """
+    Return the first JSON object in model output that parses and has every
+    required key. Falls back to the first object that parses at all, so the
+    caller can report which fields are missing.
+    """
+    required = tuple(required_keys)
+
+    # Fast path: the whole outermost span is the object, as in almost every response
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = _loads(text[start:end + 1])
+        except _DECODE_ERRORS:
+            pass
+        else:
+            if isinstance(data, dict) and all(key in data for key in required):
+                return data
+
+    first_parsed: Optional[dict] = None
+    for candidate in iter_json_objects(text):
+        try:
+            data = loads_lenient(candidate)
+        except _DECODE_ERRORS:
+            continue
+        if not isinstance(data, dict):
+            continue
+        if all(key in data for key in required):
+            return data
+        if first_parsed is None:
+            first_parsed = data
+    if first_parsed is not None:
+        return first_parsed
+    raise JSONExtractionError("No JSON found in response")
+
+
+def preview(text: str, limit: int = 300) -> str:
+    """Shortened model output for log messages."""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more characters]"
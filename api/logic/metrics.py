@@ -0,0 +1,208 @@
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# Upper bounds in seconds; spans sub-millisecond CPU stages up to slow model calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Base class for a labelled metric rendered in the Prometheus text format."""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        # Single dict update; the GIL makes this safe without a lock
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: "Histogram", labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(labels, _HistogramSeries(len(self.buckets)))
+        # Counts are stored per bucket and accumulated only when rendering
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def time(self, *labels: str) -> _Timer:
+        """Context manager that observes the duration of its block."""
+        return _Timer(self, labels)
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{label_text} {series.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS: Histogram = REGISTRY.register(Histogram(
+    "agent_stage_duration_seconds",
+    "Time spent in each stage of handling a task: prompt_build, http_wait, json_parse, validation, convert.",
+    ["stage"],
+))
+FALLBACKS: Counter = REGISTRY.register(Counter(
+    "agent_fallback_decisions_total",
+    "Fallback decisions returned instead of a model decision, by reason.",
+    ["reason"],
+))
+DECISION_CACHE_LOOKUPS: Counter = REGISTRY.register(Counter(
+    "decision_cache_lookups_total",
+    "Decision cache lookups by result (hit or miss) and the tier that answered.",
+    ["result", "tier"],
+))
+SEMANTIC_CACHE_LOOKUPS: Counter = REGISTRY.register(Counter(
+    "semantic_cache_lookups_total",
+    "Near-duplicate decision cache lookups after an exact cache miss, by result (hit, miss, or rejected when a similar request differed in negation, numbers, names, opposites or name order).",
+    ["result"],
+))
+UPSTREAM_RESPONSES: Counter = REGISTRY.register(Counter(
+    "upstream_responses_total",
+    "HTTP responses received from model backends, by backend and status code.",
+    ["backend", "status"],
+))
+ADMISSION_REJECTIONS: Counter = REGISTRY.register(Counter(
+    "admission_rejections_total",
+    "Requests shed by admission control, by priority and reason (queue_full, queue_timeout, upstream_saturated).",
+    ["priority", "reason"],
+))
+
+TOKENS: Counter = REGISTRY.register(Counter(
+    "gemini_tokens_total",
+    "Tokens reported in usageMetadata by endpoint and kind (prompt, candidates, cached).",
+    ["endpoint", "kind"],
+))
+REQUEST_TOKENS: Histogram = REGISTRY.register(Histogram(
+    "gemini_request_tokens",
+    "Tokens per upstream call by endpoint and kind (prompt, candidates).",
+    ["endpoint", "kind"],
+    buckets=(50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 4000, 8000),
+))
+
+# Substrings of fallback reasons mapped to low-cardinality metric labels, checked in order
+_FALLBACK_REASON_LABELS = (
+    ("not configured", "no_api_key"),
+    ("rate limit", "rate_limited"),
+    ("all backends unhealthy", "circuit_open"),
+    ("quota", "quota_exceeded"),
+    ("invalid api key", "invalid_api_key"),
+    ("api error", "upstream_status"),
+    ("did not respond", "upstream_unreachable"),
+    ("empty or invalid response", "empty_response"),
+    ("invalid json", "invalid_output"),
+)
+
+
+def fallback_reason_label(reason: str) -> str:
+    reason = reason.lower()
+    for needle, label in _FALLBACK_REASON_LABELS:
+        if needle in reason:
+            return label
+    return "error"
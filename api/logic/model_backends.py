@@ -0,0 +1,208 @@
+import os
+import json
+import random
+import logging
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .circuit_breaker import CircuitBreaker, OPEN
+    from .retry_policy import LatencyTracker
+except ImportError:
+    # Fallback for running this module directly
+    from circuit_breaker import CircuitBreaker, OPEN
+    from retry_policy import LatencyTracker
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+# Variables that decide which backends, and with which keys, an agent talks to
+BACKEND_ENV_VARS = ("GEMINI_BACKENDS", "GEMINI_API_BASE", "GEMINI_MODEL", "GOOGLE_API_KEY", "GEMINI_API_KEY")
+
+
+def backend_config_key() -> Tuple[Optional[str], ...]:
+    """Identifies the backend configuration currently set in the environment."""
+    return tuple(os.getenv(name) for name in BACKEND_ENV_VARS)
+
+
+class ModelBackend:
+    """
+    One generateContent-compatible model endpoint (a Gemini model, or a local stub
+    server speaking the same API), with its own health and latency statistics.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: str = DEFAULT_MODEL,
+        api_base: str = DEFAULT_API_BASE,
+        api_key: Optional[str] = None,
+        url: Optional[str] = None,
+        cost: float = 1.0,
+        error_window: int = 100,
+    ):
+        self.name = name
+        self.model = model
+        self.api_key = api_key
+        # url overrides api_base/model and should point at the ...:generateContent method
+        self.api_url = url or f"{api_base.rstrip('/')}/models/{model}:generateContent"
+        self.stream_api_url = self.api_url.replace(":generateContent", ":streamGenerateContent")
+        self.cost = cost
+        self.circuit_breaker = CircuitBreaker.from_env()
+        self.latency = LatencyTracker()
+        self._outcomes: deque = deque(maxlen=error_window)
+        self.requests = 0
+        self.failures = 0
+
+    def request_url(self, stream: bool = False) -> str:
+        if stream:
+            url = f"{self.stream_api_url}?alt=sse"
+            return f"{url}&key={self.api_key}" if self.api_key else url
+        return f"{self.api_url}?key={self.api_key}" if self.api_key else self.api_url
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for failed in self._outcomes if failed) / len(self._outcomes)
+
+    def record(self, failed: bool, latency: float) -> None:
+        """
+        Record how one call went. latency is the upstream time of its last attempt
+        alone: local rate limit waits and retry sleeps are the same for every
+        backend and must not shift traffic or trip the breaker.
+        """
+        self.requests += 1
+        self._outcomes.append(failed)
+        if failed:
+            self.failures += 1
+            self.circuit_breaker.record_failure(latency)
+        else:
+            self.latency.record(latency)
+            self.circuit_breaker.record_success(latency)
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency.quantile(0.5)
+        p99 = self.latency.quantile(0.99)
+        return {
+            "model": self.model,
+            "cost": self.cost,
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 4),
+            "p50_latency_seconds": round(p50, 3) if p50 is not None else None,
+            "p99_latency_seconds": round(p99, 3) if p99 is not None else None,
+            "circuit_breaker": self.circuit_breaker.stats(),
+        }
+
+
+class BackendRouter:
+    """
+    Picks a backend per request by a score over rolling p50/p99 latency, error
+    rate and relative cost (lower is better), skipping backends whose circuit
+    breaker is open. Backends without latency samples yet score as free so they
+    get measured; a small exploration rate keeps the statistics of the others fresh.
+    """
+
+    def __init__(
+        self,
+        backends: List[ModelBackend],
+        p50_weight: float = 1.0,
+        p99_weight: float = 0.25,
+        error_penalty: float = 30.0,
+        cost_weight: float = 0.1,
+        explore_rate: float = 0.02,
+    ):
+        if not backends:
+            raise ValueError("BackendRouter needs at least one backend")
+        self.backends = backends
+        self.p50_weight = p50_weight
+        self.p99_weight = p99_weight
+        self.error_penalty = error_penalty
+        self.cost_weight = cost_weight
+        self.explore_rate = explore_rate
+
+    @classmethod
+    def from_env(cls, default_api_key: Optional[str] = None) -> "BackendRouter":
+        """
+        Backends come from GEMINI_BACKENDS, a JSON list such as
+        [{"name": "flash", "model": "gemini-1.5-flash"},
+         {"name": "pro", "model": "gemini-1.5-pro", "cost": 10},
+         {"name": "stub", "url": "http://localhost:8081/v1beta/models/stub:generateContent", "api_key": ""}].
+        Without it there is a single backend for GEMINI_MODEL.
+        """
+        api_base = os.getenv("GEMINI_API_BASE", DEFAULT_API_BASE)
+        configs: List[Dict[str, Any]] = [{"name": "default", "model": os.getenv("GEMINI_MODEL", DEFAULT_MODEL)}]
+        raw = os.getenv("GEMINI_BACKENDS")
+        if raw:
+            try:
+                configs = json.loads(raw)
+            except json.JSONDecodeError as e:
+                logger.error(f"💥 Ignoring invalid GEMINI_BACKENDS ({e}); using the default backend")
+
+        backends = []
+        for index, config in enumerate(configs):
+            backends.append(ModelBackend(
+                name=config.get("name") or config.get("model") or f"backend{index}",
+                model=config.get("model") or (config.get("name", "custom") if config.get("url") else DEFAULT_MODEL),
+                api_base=config.get("api_base", api_base),
+                api_key=config.get("api_key", default_api_key),
+                url=config.get("url"),
+                cost=float(config.get("cost", 1.0)),
+            ))
+        return cls(
+            backends,
+            p50_weight=float(os.getenv("ROUTER_P50_WEIGHT", "1.0")),
+            p99_weight=float(os.getenv("ROUTER_P99_WEIGHT", "0.25")),
+            error_penalty=float(os.getenv("ROUTER_ERROR_PENALTY_SECONDS", "30")),
+            cost_weight=float(os.getenv("ROUTER_COST_WEIGHT", "0.1")),
+            explore_rate=float(os.getenv("ROUTER_EXPLORE_RATE", "0.02")),
+        )
+
+    @property
+    def primary(self) -> ModelBackend:
+        return self.backends[0]
+
+    def score(self, backend: ModelBackend, cost_weight: Optional[float] = None) -> float:
+        p50 = backend.latency.quantile(0.5) or 0.0
+        p99 = backend.latency.quantile(0.99) or 0.0
+        return (
+            self.p50_weight * p50
+            + self.p99_weight * p99
+            + self.error_penalty * backend.error_rate
+            + (self.cost_weight if cost_weight is None else cost_weight) * backend.cost
+        )
+
+    def select(self, exclude: Iterable[str] = (), cost_weight: Optional[float] = None) -> Optional[ModelBackend]:
+        """
+        Return the best admissible backend, or None when every candidate is unavailable.
+        cost_weight overrides the configured weight of backend cost for this request.
+        """
+        excluded = set(exclude)
+        candidates = [b for b in self.backends if b.name not in excluded]
+        if len(candidates) > 1 and random.random() < self.explore_rate:
+            random.shuffle(candidates)
+        else:
+            # sorted() is stable, so ties keep the configured order
+            candidates.sort(key=lambda backend: self.score(backend, cost_weight))
+        for backend in candidates:
+            if backend.circuit_breaker.allow_request():
+                return backend
+        return None
+
+    def all_open(self) -> bool:
+        return all(b.circuit_breaker.state == OPEN for b in self.backends)
+
+    def unavailable_for(self) -> float:
+        """Seconds until some backend accepts requests again; 0 if one does now."""
+        return min(b.circuit_breaker.open_remaining() for b in self.backends)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backends": {
+                b.name: {**b.stats(), "score": round(self.score(b), 4)} for b in self.backends
+            }
+        }
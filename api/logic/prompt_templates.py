@@ -0,0 +1,128 @@
+import sys
+import hashlib
+import logging
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class PromptTemplate:
+    """
+    A versioned prompt, compiled once into literal/field segments.
+
+    system_instruction is the static part shared by every request. It is interned
+    and sent separately from the per-request text, so it can be cached upstream
+    (Gemini cachedContents) and is never rebuilt. user_template holds the dynamic
+    part with str.format-style {fields}.
+    """
+
+    def __init__(self, name: str, version: int, user_template: str, system_instruction: str = ""):
+        self.name = name
+        self.version = version
+        self.system_instruction = sys.intern(system_instruction)
+        self._segments: List[Tuple[str, Optional[str]]] = [
+            (sys.intern(literal), field) for literal, field, _, _ in Formatter().parse(user_template)
+        ]
+        digest = hashlib.sha256(f"{system_instruction}\x00{user_template}".encode("utf-8")).hexdigest()
+        self.fingerprint = digest[:12]
+        self.id = f"{name}/v{version}:{self.fingerprint}"
+
+    def render(self, **fields: str) -> str:
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(fields[field])
+        return "".join(parts)
+
+
+@lru_cache(maxsize=4096)
+def _render_context_items(items: Tuple[Tuple[str, str], ...]) -> str:
+    return "\n".join(f"- {key}: {value}" for key, value in items)
+
+
+def render_context(context: Dict[str, Any]) -> str:
+    """Render the context block; identical contexts are rendered once and reused."""
+    if not context:
+        return "No context provided."
+    return _render_context_items(tuple((str(key), str(value)) for key, value in context.items()))
+
+
+_JSON_FORMAT_INSTRUCTIONS = """Please provide your response in the following JSON format:
+{
+  "decision": "Your clear and specific recommendation",
+  "confidence": <your_confidence_score_between_0.0_and_1.0>,
+  "reasoning": [
+    "First key point of analysis",
+    "Second important consideration", 
+    "Third supporting argument"
+  ],
+  "key_factors": {
+    "Factor 1": "Explanation of how this impacts the decision",
+    "Factor 2": "Analysis of this consideration",
+    "Factor 3": "Assessment of this element"
+  }
+}
+
+IMPORTANT: Replace <your_confidence_score_between_0.0_and_1.0> with an actual decimal between 0.0 and 1.0 based on your analysis. Higher confidence (0.8-1.0) for clear, well-supported decisions. Lower confidence (0.3-0.7) for complex or uncertain situations. Very low confidence (0.1-0.3) for highly uncertain scenarios.
+
+Provide practical, actionable advice with confidence scores that reflect the certainty of your recommendation."""
+
+_SCHEMA_INSTRUCTIONS = """Give three or more reasoning points and key factors. Set confidence between 0.0 and 1.0: 0.8-1.0 for clear, well-supported decisions, 0.3-0.7 for complex or uncertain situations, 0.1-0.3 for highly uncertain scenarios. Provide practical, actionable advice."""
+
+_PREAMBLE = "You are an expert decision-making AI. Analyze the following task and provide a structured decision."
+
+_TASK_BLOCK = """**TASK:**
+{task}
+
+**CONTEXT:**
+{context}"""
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+# (name, version) -> template. Version 1 reproduces the original single-message
+# prompts; version 2 moves the static instructions into a system instruction.
+TEMPLATES: Dict[Tuple[str, int], PromptTemplate] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    TEMPLATES[(template.name, template.version)] = template
+    return template
+
+
+register(PromptTemplate(
+    "decision_json", 1,
+    f"{_PREAMBLE}\n\n{_TASK_BLOCK}\n\n{_escape(_JSON_FORMAT_INSTRUCTIONS)}",
+))
+register(PromptTemplate(
+    "decision_schema", 1,
+    f"{_PREAMBLE}\n\n{_TASK_BLOCK}\n\n{_escape(_SCHEMA_INSTRUCTIONS)}",
+))
+register(PromptTemplate(
+    "decision_json", 2,
+    _TASK_BLOCK,
+    system_instruction=f"{_PREAMBLE} The task and its context are given in the user message.\n\n{_JSON_FORMAT_INSTRUCTIONS}",
+))
+register(PromptTemplate(
+    "decision_schema", 2,
+    _TASK_BLOCK,
+    system_instruction=f"{_PREAMBLE} The task and its context are given in the user message.\n\n{_SCHEMA_INSTRUCTIONS}",
+))
+
+
+def get_template(name: str, version: Optional[int] = None) -> PromptTemplate:
+    """Return a registered template; without a version, the latest one."""
+    if version is None:
+        version = max(v for n, v in TEMPLATES if n == name)
+    try:
+        return TEMPLATES[(name, version)]
+    except KeyError:
+        latest = max(v for n, v in TEMPLATES if n == name)
+        logger.warning(f"Prompt template {name}/v{version} does not exist; using v{latest}")
+        return TEMPLATES[(name, latest)]
@@ -0,0 +1,247 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as delay-seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """Rolling window of recent upstream latencies, used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of recent traffic so that retries cannot amplify
+    an upstream outage into a retry storm.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, window_seconds: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_seconds = window_seconds
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+
+    def _trim(self, now: float) -> None:
+        horizon = now - self.window_seconds
+        for events in (self._requests, self._retries):
+            while events and events[0] < horizon:
+                events.popleft()
+
+    def record_request(self) -> None:
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+
+class RetryPolicy:
+    """
+    Retries transient upstream failures (429, 5xx, timeouts and connection errors)
+    with capped exponential backoff and full jitter, honouring Retry-After.
+
+    When hedging is enabled, a duplicate request is started if the first one has
+    not answered within the observed p95 latency, and whichever finishes first wins.
+
+    Rate limit budget is not part of send(): execute() awaits acquire() before
+    each attempt and only then starts the clock, so the learned latency and the
+    hedge delay measure the upstream alone. A hedge is only sent when
+    try_acquire() finds budget free right away; it never queues behind the
+    primary.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 10.0,
+        budget: Optional[RetryBudget] = None,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+    ):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.budget = budget or RetryBudget()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        self.attempts = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self.hedges_launched = 0
+        self.hedges_skipped = 0
+        self.hedges_won = 0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=int(os.getenv("GEMINI_RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5")),
+            max_delay=float(os.getenv("GEMINI_RETRY_MAX_DELAY", "8")),
+            max_retry_after=float(os.getenv("GEMINI_RETRY_MAX_RETRY_AFTER", "10")),
+            budget=RetryBudget(
+                ratio=float(os.getenv("GEMINI_RETRY_BUDGET_RATIO", "0.2")),
+                min_retries=int(os.getenv("GEMINI_RETRY_BUDGET_MIN", "10")),
+            ),
+            hedge=os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            hedge_quantile=float(os.getenv("GEMINI_HEDGE_QUANTILE", "0.95")),
+            hedge_min_samples=int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20")),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    async def execute(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        acquire: Optional[Callable[[], Awaitable[None]]] = None,
+        try_acquire: Optional[Callable[[], bool]] = None,
+    ) -> httpx.Response:
+        """
+        Run send() until it yields a non-retryable response or the attempts or the
+        retry budget run out. The last response is returned (callers still call
+        raise_for_status); the last transient exception is re-raised, as is
+        anything acquire() raises.
+        """
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            if acquire is not None:
+                await acquire()
+            try:
+                response = await self._send_with_hedge(send, try_acquire)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if not self._may_retry(attempt):
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"🔁 Upstream attempt {attempt} failed ({type(e).__name__}); retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or not self._may_retry(attempt):
+                    return response
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                if retry_after is not None and retry_after > self.max_retry_after:
+                    # The server wants us gone for longer than a request can reasonably wait
+                    return response
+                delay = retry_after if retry_after is not None else self.backoff(attempt)
+                logger.warning(f"🔁 Upstream attempt {attempt} returned {response.status_code}; retrying in {delay:.2f}s")
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def _may_retry(self, attempt: int) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        if not self.budget.try_spend():
+            self.budget_exhausted += 1
+            logger.warning("Retry budget exhausted; not retrying upstream request")
+            return False
+        return True
+
+    async def _timed_send(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        self.attempts += 1
+        started = time.perf_counter()
+        response = await send()
+        if response.status_code < 400:
+            self.latency.record(time.perf_counter() - started)
+        return response
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.quantile(self.hedge_quantile)
+
+    async def _send_with_hedge(
+        self, send: Callable[[], Awaitable[httpx.Response]], try_acquire: Optional[Callable[[], bool]]
+    ) -> httpx.Response:
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None:
+            return await self._timed_send(send)
+
+        primary = asyncio.ensure_future(self._timed_send(send))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+        if try_acquire is not None and not try_acquire():
+            # No budget to spare for a duplicate; let the primary finish on its own
+            self.hedges_skipped += 1
+            return await primary
+
+        self.hedges_launched += 1
+        logger.info(f"🪞 Upstream slower than p{int(self.hedge_quantile * 100)} ({hedge_delay:.2f}s); sending hedged request")
+        hedged = asyncio.ensure_future(self._timed_send(send))
+        pending = {primary, hedged}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # Prefer a usable answer; only surface a failure once both have failed
+                    if task.exception() is None and (not pending or task.result().status_code < 500):
+                        if task is hedged:
+                            self.hedges_won += 1
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.quantile(0.95)
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "budget_exhausted": self.budget_exhausted,
+            "hedging": self.hedge,
+            "hedges_launched": self.hedges_launched,
+            "hedges_skipped": self.hedges_skipped,
+            "hedges_won": self.hedges_won,
+            "p95_latency_seconds": round(p95, 3) if p95 is not None else None,
+        }
@@ -0,0 +1,304 @@
+import os
+import re
+import math
+import time
+import zlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    from .metrics import SEMANTIC_CACHE_LOOKUPS
+except ImportError:
+    # Fallback for running this module directly
+    from metrics import SEMANTIC_CACHE_LOOKUPS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_CONTRACTED_NOT = re.compile(r"n['’]t\b")
+_SENTENCE = re.compile(r"[.?!:;\n]+")
+
+# Words that flip the meaning of a question; "n't" is expanded to "not" first
+NEGATIONS = frozenset("not no never none nor neither without cannot".split())
+
+# One-word swaps that turn a question into its opposite while barely moving its vector
+_OPPOSITE_PAIRS = (
+    ("buy", "sell"), ("increase", "decrease"), ("accept", "reject"), ("hire", "fire"),
+    ("add", "remove"), ("raise", "lower"), ("start", "stop"), ("open", "close"),
+    ("enable", "disable"), ("upgrade", "downgrade"), ("expand", "reduce"), ("more", "less"),
+    ("before", "after"), ("long", "short"), ("frontend", "backend"), ("import", "export"),
+)
+OPPOSITES = {a: b for pair in _OPPOSITE_PAIRS for a, b in (pair, pair[::-1])}
+
+# Too common to tell two requests apart; never used to find candidates
+STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from has have how i if in into is it its "
+    "me my no not of on or our should so than that the their them then there these they this to "
+    "us was we what when where which who why will with would you your".split()
+)
+
+SparseVector = Dict[int, float]
+
+
+class HashedNgramVectorizer:
+    """
+    Embeds text as a sparse, L2-normalised vector without a model or a vocabulary.
+
+    Features are words, word bigrams and character n-grams of each word (so
+    "migrate" and "migrating" overlap), hashed with crc32 into `dimensions`
+    buckets with a hash-derived sign. Counts are log-scaled so repeated words
+    do not dominate. The hash is stable across processes.
+    """
+
+    def __init__(self, dimensions: int = 1 << 20, char_ngrams: Tuple[int, ...] = (3, 4)):
+        self.dimensions = dimensions
+        self.char_ngrams = char_ngrams
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        digest = zlib.crc32(feature.encode("utf-8"))
+        return (digest & 0x7FFFFFFF) % self.dimensions, 1.0 if digest & 0x80000000 else -1.0
+
+    def words(self, text: str) -> List[str]:
+        return _WORD.findall(_CONTRACTED_NOT.sub(" not", text.lower()))
+
+    def vectorize(self, words: List[str]) -> SparseVector:
+        counts: Dict[str, int] = {}
+        for index, word in enumerate(words):
+            counts[word] = counts.get(word, 0) + 1
+            if index:
+                bigram = f"{words[index - 1]} {word}"
+                counts[bigram] = counts.get(bigram, 0) + 1
+            padded = f"<{word}>"
+            for n in self.char_ngrams:
+                for start in range(len(padded) - n + 1):
+                    gram = "#" + padded[start:start + n]
+                    counts[gram] = counts.get(gram, 0) + 1
+
+        vector: SparseVector = {}
+        for feature, count in counts.items():
+            bucket, sign = self._bucket(feature)
+            vector[bucket] = vector.get(bucket, 0.0) + sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm:
+            for bucket in vector:
+                vector[bucket] /= norm
+        return vector
+
+
+def named_terms(text: str) -> Set[str]:
+    """
+    Lowercased words written like names: mixed case anywhere ("PostgreSQL",
+    "AWS") or capitalised other than as the first word of a sentence.
+    """
+    names: Set[str] = set()
+    for sentence in _SENTENCE.split(text):
+        for index, word in enumerate(_WORD.findall(sentence)):
+            if word[1:] != word[1:].lower() or (index and word[0].isupper()):
+                lowered = word.lower()
+                if lowered not in STOPWORDS and lowered not in NEGATIONS:
+                    names.add(lowered)
+    return names
+
+
+def cosine(a: SparseVector, b: SparseVector) -> float:
+    """Cosine similarity of two normalised sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(bucket, 0.0) for bucket, value in a.items())
+
+
+class Embedding:
+    """
+    A request text as the cache compares it: its vector, plus the features a
+    bag of n-grams cannot see and that decide whether two similar texts ask the
+    same question.
+    """
+    __slots__ = ("vector", "terms", "names", "negations", "numbers")
+
+    def __init__(self, vector: SparseVector, terms: List[str], names: Set[str], negations: int,
+                 numbers: Tuple[str, ...]):
+        self.vector = vector
+        # Non-stopword words in order of first occurrence
+        self.terms = terms
+        self.names = names
+        self.negations = negations
+        self.numbers = numbers
+
+    def conflicts_with(self, other: "Embedding") -> Optional[str]:
+        """Why a cached answer to `other` must not answer this text, or None if it may."""
+        if self.negations != other.negations:
+            return "negation"
+        if self.numbers != other.numbers:
+            return "numbers"
+        # A different verb may be a synonym; a different product or place is a different question
+        own, theirs = set(self.terms), set(other.terms)
+        if (own - theirs) & self.names or (theirs - own) & other.names:
+            return "names"
+        if any(OPPOSITES.get(term) in theirs - own for term in own - theirs):
+            return "opposites"
+        # "from A to B" and "from B to A" share every n-gram but the bigrams
+        shared = own & theirs & (self.names | other.names)
+        if [t for t in self.terms if t in shared] != [t for t in other.terms if t in shared]:
+            return "order"
+        return None
+
+
+class _Entry:
+    __slots__ = ("key", "scope", "embedding", "value", "expires_at")
+
+    def __init__(self, key: str, scope: str, embedding: Embedding, value: Dict[str, Any], expires_at: float):
+        self.key = key
+        self.scope = scope
+        self.embedding = embedding
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """
+    Near-duplicate decision cache: reuses a decision made for a sufficiently
+    similar request instead of calling the model again.
+
+    Requests are embedded with HashedNgramVectorizer and compared only within a
+    scope (model, template and generation settings), so a match never crosses
+    priorities or models. Lookups first gather candidates that share
+    non-stopword terms through an inverted index, then rank up to
+    max_candidates of them by exact cosine similarity; the best one at or above
+    threshold is a hit. Entries are evicted LRU beyond max_entries and expire
+    after ttl_seconds.
+
+    N-gram similarity cannot tell "should we migrate" from "should we not
+    migrate", or A-to-B from B-to-A, so a candidate above the threshold is
+    still rejected when its negations, numbers, names, a known opposite
+    ("buy"/"sell") or the order of the names both texts share differ
+    (Embedding.conflicts_with). That keeps the common ways of asking the
+    opposite question apart, not every one, which is why the cache is off by
+    default and the threshold is high.
+    """
+
+    def __init__(self, vectorizer: Optional[HashedNgramVectorizer] = None, threshold: float = 0.95,
+                 max_entries: int = 2048, ttl_seconds: float = 3600.0, max_candidates: int = 32,
+                 enabled: bool = False):
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_candidates = max_candidates
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._postings: Dict[Tuple[str, str], Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self._similarity_sum = 0.0
+
+    @classmethod
+    def from_env(cls) -> "SemanticCache":
+        return cls(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048")),
+            ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600")),
+            max_candidates=int(os.getenv("SEMANTIC_CACHE_MAX_CANDIDATES", "32")),
+            enabled=os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes"),
+        )
+
+    def embed(self, text: str) -> Embedding:
+        words = self.vectorizer.words(text)
+        return Embedding(
+            self.vectorizer.vectorize(words),
+            list(dict.fromkeys(word for word in words if word not in STOPWORDS)),
+            named_terms(text),
+            sum(word in NEGATIONS for word in words),
+            tuple(sorted(_NUMBER.findall(text))),
+        )
+
+    def lookup(self, scope: str, text: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """The cached decision of the most similar request and its similarity, or None."""
+        if not self.enabled:
+            return None
+        embedding = self.embed(text)
+        shared: Dict[str, int] = {}
+        for term in embedding.terms:
+            for key in self._postings.get((scope, term), ()):
+                shared[key] = shared.get(key, 0) + 1
+        candidates = sorted(shared, key=shared.__getitem__, reverse=True)[:self.max_candidates]
+
+        now = time.monotonic()
+        scored: List[Tuple[float, _Entry]] = []
+        for key in candidates:
+            entry = self._entries[key]
+            if entry.expires_at < now:
+                self._remove(entry)
+                continue
+            similarity = cosine(embedding.vector, entry.embedding.vector)
+            if similarity >= self.threshold:
+                scored.append((similarity, entry))
+
+        best: Optional[_Entry] = None
+        best_similarity = 0.0
+        rejected = False
+        for similarity, entry in sorted(scored, key=lambda pair: pair[0], reverse=True):
+            conflict = embedding.conflicts_with(entry.embedding)
+            if conflict is None:
+                best, best_similarity = entry, similarity
+                break
+            rejected = True
+            logger.debug(f"🧭 Similar request rejected ({conflict} differs, similarity {similarity:.3f})")
+
+        if best is None:
+            self.misses += 1
+            if rejected:
+                self.rejections += 1
+            SEMANTIC_CACHE_LOOKUPS.inc("rejected" if rejected else "miss")
+            return None
+        self._entries.move_to_end(best.key)
+        self.hits += 1
+        self._similarity_sum += best_similarity
+        SEMANTIC_CACHE_LOOKUPS.inc("hit")
+        return best.value, best_similarity
+
+    def add(self, scope: str, key: str, text: str, value: Dict[str, Any]) -> None:
+        """Index a decision under its exact cache key; re-adding a key replaces it."""
+        if not self.enabled:
+            return
+        existing = self._entries.get(key)
+        if existing is not None:
+            self._remove(existing)
+        embedding = self.embed(text)
+        self._entries[key] = _Entry(key, scope, embedding, value, time.monotonic() + self.ttl_seconds)
+        for term in embedding.terms:
+            self._postings.setdefault((scope, term), set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries.values())))
+            self.evictions += 1
+
+    def _remove(self, entry: _Entry) -> None:
+        del self._entries[entry.key]
+        for term in entry.embedding.terms:
+            keys = self._postings.get((entry.scope, term))
+            if keys is not None:
+                keys.discard(entry.key)
+                if not keys:
+                    del self._postings[(entry.scope, term)]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._postings.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "mean_hit_similarity": round(self._similarity_sum / self.hits, 4) if self.hits else None,
+            "rejections": self.rejections,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,40 @@
+import json
+from typing import Any, Callable
+
+# Prefer a fast JSON encoder when one is installed, as json_extract does for decoding.
+# dumps() returns compact UTF-8 bytes; fragment() pre-encodes a constant value once so
+# every later dumps() embeds those bytes as-is instead of walking the value again
+try:
+    import orjson
+
+    dumps: Callable[[Any], bytes] = orjson.dumps
+
+    if hasattr(orjson, "Fragment"):
+        def fragment(value: Any) -> Any:
+            return orjson.Fragment(orjson.dumps(value))
+    else:
+        # orjson < 3.9 has no Fragment; constants are encoded on every call
+        def fragment(value: Any) -> Any:
+            return value
+
+    JSON_ENCODER = "orjson"
+except ImportError:
+    try:
+        import msgspec
+
+        _encoder = msgspec.json.Encoder()
+        dumps = _encoder.encode
+
+        def fragment(value: Any) -> Any:
+            return msgspec.Raw(_encoder.encode(value))
+
+        JSON_ENCODER = "msgspec"
+    except ImportError:
+        def dumps(value: Any) -> bytes:
+            # Same output as Starlette's JSONResponse
+            return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+        def fragment(value: Any) -> Any:
+            return value
+
+        JSON_ENCODER = "json"
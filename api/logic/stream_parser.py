@@ -0,0 +1,141 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_END = ",}]" + _WHITESPACE
+
+
+class IncrementalDecisionParser:
+    """
+    Incremental JSON parser for a Decision streamed in arbitrary text chunks.
+
+    It scans each chunk once, keeping its position in the JSON structure between
+    calls, and reports every field of interest as soon as its value is complete:
+
+        ("decision", str)
+        ("confidence", float)
+        ("reasoning", {"index": int, "text": str})
+        ("key_factors", {"factor": str, "explanation": str})
+
+    key_factors may arrive either as an object or, from structured output, as a
+    list of {"factor": ..., "explanation": ...} items. Anything before the first "{"
+    (prose, code fences) is ignored, and parsing stops once the top-level object closes.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        # Each frame is [kind, key_or_index, expecting_key] for an open object/array
+        self._stack: List[list] = []
+        self._token: Optional[List[str]] = None
+        self._in_string = False
+        self._escape = False
+        self._pending_key: Optional[str] = None
+        # Structured output sends key_factors as a list of {"factor", "explanation"}
+        self._factor_item: Dict[str, Any] = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        for char in chunk:
+            if self.done:
+                break
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self._stack.append(["object", None, True])
+                continue
+            if self._in_string:
+                self._consume_string_char(char, events)
+                continue
+            if self._token is not None:
+                if char not in _SCALAR_END:
+                    self._token.append(char)
+                    continue
+                self._finish_scalar("".join(self._token), events)
+                self._token = None
+            self._consume_structural_char(char, events)
+        return events
+
+    def _consume_string_char(self, char: str, events: List[Tuple[str, Any]]) -> None:
+        if self._escape:
+            self._escape = False
+            self._token.append(char)
+        elif char == "\\":
+            self._escape = True
+            self._token.append(char)
+        elif char == '"':
+            self._in_string = False
+            raw = "".join(self._token)
+            self._token = None
+            try:
+                value = json.loads(f'"{raw}"')
+            except json.JSONDecodeError:
+                value = raw
+            frame = self._stack[-1]
+            if frame[0] == "object" and frame[2]:
+                self._pending_key = value
+            else:
+                self._emit(value, events)
+        else:
+            self._token.append(char)
+
+    def _consume_structural_char(self, char: str, events: List[Tuple[str, Any]]) -> None:
+        if char in _WHITESPACE:
+            return
+        frame = self._stack[-1]
+        if char == '"':
+            self._in_string = True
+            self._token = []
+        elif char == ":":
+            frame[1] = self._pending_key
+            frame[2] = False
+        elif char == ",":
+            if frame[0] == "object":
+                frame[2] = True
+            else:
+                frame[1] += 1
+        elif char in "{[":
+            self._stack.append(["object", None, True] if char == "{" else ["array", 0, False])
+        elif char in "}]":
+            self._stack.pop()
+            if not self._stack:
+                self.done = True
+        else:
+            # Start of a number or literal (true/false/null)
+            self._token = [char]
+
+    def _finish_scalar(self, raw: str, events: List[Tuple[str, Any]]) -> None:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            logger.debug(f"Skipping unparseable scalar in stream: {raw!r}")
+            return
+        self._emit(value, events)
+
+    def _emit(self, value: Any, events: List[Tuple[str, Any]]) -> None:
+        path = [frame[1] for frame in self._stack]
+        if len(path) == 1 and path[0] == "decision":
+            events.append(("decision", value))
+        elif len(path) == 1 and path[0] == "confidence":
+            try:
+                events.append(("confidence", float(value)))
+            except (TypeError, ValueError):
+                pass
+        elif len(path) == 2 and path[0] == "reasoning":
+            events.append(("reasoning", {"index": path[1], "text": value}))
+        elif len(path) == 2 and path[0] == "key_factors":
+            events.append(("key_factors", {"factor": path[1], "explanation": value}))
+        elif len(path) == 3 and path[0] == "key_factors" and path[2] in ("factor", "explanation"):
+            if self._factor_item.get("index") != path[1]:
+                self._factor_item = {"index": path[1]}
+            self._factor_item[path[2]] = value
+            if "factor" in self._factor_item and "explanation" in self._factor_item:
+                events.append(("key_factors", {
+                    "factor": str(self._factor_item["factor"]),
+                    "explanation": str(self._factor_item["explanation"]),
+                }))
+                self._factor_item = {}
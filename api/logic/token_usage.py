@@ -0,0 +1,133 @@
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+from pydantic import BaseModel
+
+try:
+    from .metrics import TOKENS, REQUEST_TOKENS
+except ImportError:
+    # Fallback for running this module directly
+    from metrics import TOKENS, REQUEST_TOKENS
+
+# Route that triggered the current upstream call; set by each endpoint, inherited by
+# the tasks it spawns, so coalesced requests are billed once to the leader's endpoint
+usage_endpoint: ContextVar[str] = ContextVar("usage_endpoint", default="unknown")
+
+
+class TokenUsage(BaseModel):
+    """Token counts Gemini reported for one upstream call (usageMetadata)."""
+    prompt_tokens: int = 0
+    candidates_tokens: int = 0
+    cached_tokens: int = 0
+    total_tokens: int = 0
+
+    @classmethod
+    def from_metadata(cls, metadata: Optional[Dict[str, Any]]) -> "TokenUsage":
+        metadata = metadata or {}
+        prompt = metadata.get("promptTokenCount", 0)
+        candidates = metadata.get("candidatesTokenCount", 0)
+        return cls(
+            prompt_tokens=prompt,
+            candidates_tokens=candidates,
+            cached_tokens=metadata.get("cachedContentTokenCount", 0),
+            total_tokens=metadata.get("totalTokenCount", prompt + candidates),
+        )
+
+
+class _UsageWindow:
+    __slots__ = ("start", "requests", "prompt", "candidates", "cached", "total")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.requests = 0
+        self.prompt = 0
+        self.candidates = 0
+        self.cached = 0
+        self.total = 0
+
+    def add(self, usage: TokenUsage) -> None:
+        self.requests += 1
+        self.prompt += usage.prompt_tokens
+        self.candidates += usage.candidates_tokens
+        self.cached += usage.cached_tokens
+        self.total += usage.total_tokens
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "start": self.start,
+            "requests": self.requests,
+            "prompt_tokens": self.prompt,
+            "candidates_tokens": self.candidates,
+            "cached_tokens": self.cached,
+            "total_tokens": self.total,
+        }
+
+
+class UsageAccountant:
+    """
+    Token usage per endpoint, kept as lifetime totals plus fixed-length time windows.
+
+    Only the most recent max_windows windows of window_seconds each are retained,
+    so memory stays bounded however long the process runs.
+    """
+
+    def __init__(self, window_seconds: float = 60.0, max_windows: int = 60):
+        self.window_seconds = window_seconds
+        self.max_windows = max_windows
+        self._windows: Dict[str, Deque[_UsageWindow]] = {}
+        self._totals: Dict[str, _UsageWindow] = {}
+
+    @classmethod
+    def from_env(cls) -> "UsageAccountant":
+        return cls(
+            window_seconds=float(os.getenv("TOKEN_USAGE_WINDOW_SECONDS", "60")),
+            max_windows=int(os.getenv("TOKEN_USAGE_WINDOWS", "60")),
+        )
+
+    def record(self, usage: TokenUsage, endpoint: Optional[str] = None) -> None:
+        endpoint = endpoint or usage_endpoint.get()
+        start = time.time() // self.window_seconds * self.window_seconds
+        windows = self._windows.setdefault(endpoint, deque(maxlen=self.max_windows))
+        if not windows or windows[-1].start != start:
+            windows.append(_UsageWindow(start))
+        windows[-1].add(usage)
+        self._totals.setdefault(endpoint, _UsageWindow(0.0)).add(usage)
+
+        TOKENS.inc(endpoint, "prompt", amount=usage.prompt_tokens)
+        TOKENS.inc(endpoint, "candidates", amount=usage.candidates_tokens)
+        TOKENS.inc(endpoint, "cached", amount=usage.cached_tokens)
+        REQUEST_TOKENS.observe(usage.prompt_tokens, endpoint, "prompt")
+        REQUEST_TOKENS.observe(usage.candidates_tokens, endpoint, "candidates")
+
+    def windows(self, endpoint: str) -> List[Dict[str, Any]]:
+        cutoff = time.time() - self.window_seconds * self.max_windows
+        return [window.as_dict() for window in self._windows.get(endpoint, ()) if window.start >= cutoff]
+
+    def summary(self, seconds: float) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint sums over the windows that overlap the last `seconds`."""
+        cutoff = time.time() - seconds
+        result = {}
+        for endpoint, windows in self._windows.items():
+            combined = _UsageWindow(cutoff)
+            for window in windows:
+                if window.start + self.window_seconds > cutoff:
+                    combined.requests += window.requests
+                    combined.prompt += window.prompt
+                    combined.candidates += window.candidates
+                    combined.cached += window.cached
+                    combined.total += window.total
+            result[endpoint] = combined.as_dict()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        totals = {}
+        for endpoint, window in self._totals.items():
+            totals[endpoint] = window.as_dict()
+            totals[endpoint].pop("start")
+        return {
+            "window_seconds": self.window_seconds,
+            "totals": totals,
+            "last_window": self.summary(self.window_seconds),
+        }
@@ -0,0 +1,105 @@
+import os
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# OpenTelemetry is optional and only imported once tracing is enabled, so it stays off
+# the cold-start path; until then every span below is a no-op
+_tracer = None
+_provider = None
+
+
+def _create_exporter(kind: str):
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    if kind == "file":
+        path = os.getenv("OTEL_TRACES_FILE", "traces.jsonl")
+        # One JSON span per line; the file stays open for the life of the process
+        stream = open(path, "a", encoding="utf-8")
+        logger.info(f"✅ Writing trace spans to {path}")
+        return ConsoleSpanExporter(out=stream, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if kind == "console":
+        return ConsoleSpanExporter()
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    # Endpoint, headers and timeout come from the standard OTEL_EXPORTER_OTLP_* variables
+    logger.info("✅ Exporting trace spans over OTLP")
+    return OTLPSpanExporter()
+
+
+def configure_tracing() -> bool:
+    """
+    Install a tracer provider from the environment. Returns whether tracing is active.
+
+    OTEL_TRACING_ENABLED turns tracing on; OTEL_TRACES_EXPORTER picks "otlp" (a local
+    or remote collector), "file" (JSON lines at OTEL_TRACES_FILE) or "console".
+    Call once per worker process, after any fork.
+    """
+    global _tracer, _provider
+    if _tracer is not None:
+        return True
+    if os.getenv("OTEL_TRACING_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import opentelemetry  # noqa: F401
+    except ImportError:
+        logger.warning("OTEL_TRACING_ENABLED is set but opentelemetry is not installed; tracing disabled.")
+        return False
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        exporter = _create_exporter(os.getenv("OTEL_TRACES_EXPORTER", "otlp").lower())
+    except ImportError as e:
+        logger.warning(f"OpenTelemetry SDK or exporter missing ({e}); tracing disabled.")
+        return False
+
+    resource = Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "agentic-xai-api")})
+    _provider = TracerProvider(resource=resource)
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _provider.get_tracer(__name__)
+    logger.info("✅ OpenTelemetry tracing enabled")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flush buffered spans and stop the exporter."""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """Child span of the current span; yields None when tracing is off."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes) as span:
+        yield span
+
+
+def set_span_attributes(attributes: Dict[str, Any]) -> None:
+    """Attach attributes to the current span, skipping missing (None) values."""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    span = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            span.set_attribute(key, value)
+
+
+def mark_span_error(description: str) -> None:
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().set_status(trace.Status(trace.StatusCode.ERROR, description))
@@ -1,30 +1,60 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, Response
 import logging
 import os
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
-from dotenv import load_dotenv
 
 # Add the api directory to Python path
 api_dir = Path(__file__).parent
 sys.path.insert(0, str(api_dir))
 
-from routes import tasks
+# Load environment variables from a .env file before any module reads them. Deployed
+# platforms inject variables directly, so without a .env file dotenv is never imported
+dotenv_path = next((d / ".env" for d in (Path.cwd(), api_dir, api_dir.parent) if (d / ".env").is_file()), None)
+if dotenv_path:
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path)
 
-# Load environment variables from .env file
-load_dotenv()
+from routes import tasks
+from logic.metrics import REGISTRY
+from logic.tracing import configure_tracing, shutdown_tracing
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Serverless platforms start a process per cold start and may freeze it between
+# requests; there the agent and job workers are created on first use instead of at startup
+LAZY_STARTUP = os.getenv(
+    "LAZY_STARTUP", "true" if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "false"
+).lower() in ("1", "true", "yes")
+
+# ===== LIFECYCLE =====
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker process, after the fork
+    # Tracing is set up before any spans are started
+    configure_tracing()
+    if not LAZY_STARTUP:
+        # Build this worker's agent and open its upstream connections before the first request
+        agent = await tasks.get_agent()
+        await agent.warm_up()
+        # Start job workers so jobs persisted before a restart are picked up again
+        await tasks.get_job_queue()
+    yield
+    # The server has stopped accepting connections and drained in-flight requests by now
+    await tasks.close_resources()
+    shutdown_tracing()
+
 # ===== FASTAPI APP =====
 app = FastAPI(
     title="Agentic-XAI API",
     version="4.0.0",
-    description="AI Decision Making API"
+    description="AI Decision Making API",
+    lifespan=lifespan
 )
 
 app.include_router(tasks.router)
@@ -44,7 +74,7 @@ async def root():
         "message": "Agentic-XAI API",
         "version": "4.0.0",
         "status": "running",
-        "endpoints": ["/health", "/debug", "/task", "/test"]
+        "endpoints": ["/health", "/debug", "/task", "/task/stream", "/tasks/batch", "/jobs", "/usage", "/metrics", "/test"]
     }
 
 @app.get("/test", response_class=PlainTextResponse)
@@ -53,11 +83,44 @@ async def test_endpoint():
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
+    # Liveness probe: reports what this worker has built so far and never builds anything,
+    # so probing a LAZY_STARTUP worker does not create its agent or start its job workers
+    agent, queue, admission = tasks.loaded_resources()
+    health = {
+        "status": "degraded" if agent is not None and agent.router.all_open() else "healthy",
         "version": "4.0.0",
-        "timestamp": "running"
+        "timestamp": "running",
+        "agent_loaded": agent is not None,
     }
+    if agent is not None:
+        health.update({
+            "decision_cache": agent.decision_cache.stats(),
+            "semantic_cache": agent.semantic_cache.stats(),
+            "context_cache": agent.context_cache.stats(),
+            "single_flight": agent.single_flight.stats(),
+            "rate_limiter": agent.rate_limiter.stats(),
+            "retry_policy": agent.retry_policy.stats(),
+            "model_router": agent.router.stats(),
+            "token_usage": agent.token_usage.stats(),
+            "output_predictor": agent.output_predictor.stats()
+        })
+    if queue is not None:
+        health["job_queue"] = await queue.stats()
+    if admission is not None:
+        health["admission"] = admission.stats()
+    return health
+
+@app.get("/usage")
+async def token_usage(agent = Depends(tasks.get_agent)):
+    # Per-endpoint token usage, lifetime and per time window
+    stats = agent.token_usage.stats()
+    stats["windows"] = {endpoint: agent.token_usage.windows(endpoint) for endpoint in stats["totals"]}
+    return stats
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus scrape endpoint
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/debug")
 async def debug_info():
@@ -73,5 +136,5 @@ async def debug_info():
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    from server import run
+    run(app) 
\ No newline at end of file
@@ -1,39 +1,43 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from contextlib import AsyncExitStack
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
 import logging
 import os
-import sys
 
-# Add parent directory to path for imports
-parent_dir = os.path.dirname(os.path.dirname(__file__))
-sys.path.insert(0, parent_dir)
+# api/ is on sys.path (see main.py). Only light modules are imported here; the agent
+# (httpx and its subsystems) and the job queue (sqlite3) load on first use, which
+# keeps them off the serverless cold-start path
+from logic.metrics import STAGE_SECONDS
+from logic.tracing import start_span
+from logic.token_usage import TokenUsage, usage_endpoint
+from logic.admission import AdmissionController, AdmissionRejected
+from logic.serialization import dumps, fragment
 
-# Import with error handling for different environments
-try:
-    from api.logic.agent_logic import IntelligentAgent, Decision
-except ImportError:
-    # Fallback for direct import
-    try:
-        from logic.agent_logic import IntelligentAgent, Decision
-    except ImportError:
-        # Fallback for Vercel serverless environment
-        import importlib.util
-        logic_path = os.path.join(parent_dir, 'logic', 'agent_logic.py')
-        spec = importlib.util.spec_from_file_location("agent_logic", logic_path)
-        agent_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(agent_module)
-        IntelligentAgent = agent_module.IntelligentAgent
-        Decision = agent_module.Decision
+if TYPE_CHECKING:
+    from logic.agent_logic import IntelligentAgent, Decision
+    from logic.agent_registry import AgentRegistry
+    from logic.job_queue import JobQueue
 
 from pydantic import BaseModel, Field
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson or msgspec when installed"""
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
 class TaskRequest(BaseModel):
     task: str
     context: str = ""
     priority: str = "medium"
+    include_usage: bool = False
 
 class TaskResponse(BaseModel):
     recommendation: str
@@ -42,36 +46,84 @@ class TaskResponse(BaseModel):
     alternatives: List[Dict[str, Any]]
     risk_factors: List[str]
     decision_id: str
+    # Only present when the request sets include_usage
+    usage: Optional[TokenUsage] = None
+
+# Batch limits; callers may ask for less concurrency but never more
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_ITEM_TIMEOUT = float(os.getenv("BATCH_ITEM_TIMEOUT_SECONDS", "60"))
+
+class BatchTaskRequest(BaseModel):
+    tasks: List[TaskRequest]
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    item_timeout: Optional[float] = Field(default=None, gt=0)
+
+class BatchTaskResult(BaseModel):
+    index: int
+    status: str
+    result: Optional[TaskResponse] = None
+    error: Optional[str] = None
+
+class BatchTaskResponse(BaseModel):
+    results: List[BatchTaskResult]
+    succeeded: int
+    failed: int
+
+# Longest a GET /jobs/{job_id}/result call may block waiting for the job
+JOB_RESULT_MAX_WAIT = float(os.getenv("JOB_RESULT_MAX_WAIT_SECONDS", "25"))
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    result_url: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    attempts: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+# Static parts of every TaskResponse. The frontend expects two alternatives: the
+# recommendation itself and a generic alternative approach
+RECOMMENDED_PROS = ["Based on AI analysis", "Data-driven recommendation"]
+RECOMMENDED_CONS = ["Requires careful implementation", "May need adjustments"]
+ALTERNATIVE_APPROACH = {
+    "option": "Alternative Approach",
+    "description": "Consider alternative solutions with different trade-offs",
+    "pros": ["Different perspective", "Risk mitigation"],
+    "cons": ["May require more research", "Unknown outcomes"]
+}
+# The same constants pre-encoded once for encode_task_response
+_RECOMMENDED_PROS_JSON = fragment(RECOMMENDED_PROS)
+_RECOMMENDED_CONS_JSON = fragment(RECOMMENDED_CONS)
+_ALTERNATIVE_APPROACH_JSON = fragment(ALTERNATIVE_APPROACH)
 
 def convert_decision_to_response(decision, decision_id: str) -> TaskResponse:
     """Convert Decision model to TaskResponse format expected by frontend"""
     # Convert reasoning list to string
     reasoning_text = " ".join(decision.reasoning) if isinstance(decision.reasoning, list) else str(decision.reasoning)
     
-    # Convert key_factors to alternatives and risk_factors
-    alternatives = []
-    risk_factors = []
-    
     # Create default alternatives based on decision
     alternatives = [
         {
             "option": "Recommended Approach",
             "description": decision.decision,
-            "pros": ["Based on AI analysis", "Data-driven recommendation"],
-            "cons": ["Requires careful implementation", "May need adjustments"]
+            "pros": RECOMMENDED_PROS,
+            "cons": RECOMMENDED_CONS
         },
-        {
-            "option": "Alternative Approach", 
-            "description": "Consider alternative solutions with different trade-offs",
-            "pros": ["Different perspective", "Risk mitigation"],
-            "cons": ["May require more research", "Unknown outcomes"]
-        }
+        ALTERNATIVE_APPROACH
     ]
     
     # Convert key_factors to risk_factors
     risk_factors = [f"{key}: {value}" for key, value in decision.key_factors.items()]
     
-    return TaskResponse(
+    # Every field already has its declared type, so skip validation
+    return TaskResponse.model_construct(
         recommendation=decision.decision,
         reasoning=reasoning_text,
         confidence=decision.confidence * 100,  # Convert to percentage
@@ -80,12 +132,92 @@ def convert_decision_to_response(decision, decision_id: str) -> TaskResponse:
         decision_id=decision_id
     )
 
+def encode_task_response(decision, decision_id: str, usage: Optional[TokenUsage] = None) -> bytes:
+    """
+    The JSON of convert_decision_to_response(decision, decision_id), with usage if
+    given, encoded without building a TaskResponse.
+    """
+    content: Dict[str, Any] = {
+        "recommendation": decision.decision,
+        "reasoning": " ".join(decision.reasoning),
+        "confidence": decision.confidence * 100,
+        "alternatives": [
+            {
+                "option": "Recommended Approach",
+                "description": decision.decision,
+                "pros": _RECOMMENDED_PROS_JSON,
+                "cons": _RECOMMENDED_CONS_JSON
+            },
+            _ALTERNATIVE_APPROACH_JSON
+        ],
+        "risk_factors": [f"{key}: {value}" for key, value in decision.key_factors.items()],
+        "decision_id": decision_id,
+    }
+    if usage is not None:
+        content["usage"] = usage.model_dump(mode="json")
+    return dumps(content)
+
+def make_decision_id(request: TaskRequest) -> str:
+    """Stable identifier derived from the request inputs"""
+    input_str = f"{request.task}{request.context}{request.priority}"
+    decision_hash = hashlib.md5(input_str.encode()).hexdigest()[:8]
+    return f"decision_{decision_hash}"
+
+async def decide(request: TaskRequest, agent) -> "Decision":
+    """Generate the decision for one request"""
+    return await agent.generate_decision(
+        task_description=request.task,
+        context={"details": request.context, "priority": request.priority},
+        priority=request.priority
+    )
+
+async def run_task(request: TaskRequest, agent) -> TaskResponse:
+    """Generate a decision for one request and convert it to the frontend format"""
+    decision = await decide(request, agent)
+    with STAGE_SECONDS.time("convert"):
+        response = convert_decision_to_response(decision, make_decision_id(request))
+    if request.include_usage:
+        # Cached decisions cost no tokens
+        response.usage = decision.usage or TokenUsage()
+    return response
+
+async def run_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job queue handler: run a queued TaskRequest and return the TaskResponse as a dict"""
+    usage_endpoint.set("/jobs")
+    response = await run_task(TaskRequest(**payload), await get_agent())
+    return response.model_dump(exclude_none=True)
+
+def job_status(job) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        error=job.error
+    )
+
+def admission_error(rejection: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=rejection.status_code,
+        detail=rejection.reason,
+        headers={"Retry-After": str(rejection.retry_after)}
+    )
+
 router = APIRouter()
 
-# Dependency to get the agent instance
-def get_agent():
+_agents: Optional["AgentRegistry"] = None
+
+# Dependency to get the agent for the running event loop; built on first use.
+# Async so it runs on the loop itself rather than in the threadpool
+async def get_agent() -> "IntelligentAgent":
+    global _agents
+    if _agents is None:
+        from logic.agent_registry import AgentRegistry
+        _agents = AgentRegistry()
     try:
-        return IntelligentAgent.get_instance()
+        return _agents.get()
     except RuntimeError as e:
         logger.error(f"Failed to initialize agent: {e}")
         raise HTTPException(
@@ -93,41 +225,241 @@ def get_agent():
             detail="Agent service is unavailable due to initialization failure."
         )
 
-@router.post("/task", response_model=TaskResponse)
+_job_queue: Optional["JobQueue"] = None
+
+# Dependency to get the job queue; workers start on first use inside the event loop
+async def get_job_queue() -> "JobQueue":
+    global _job_queue
+    if _job_queue is None:
+        from logic.job_queue import JobQueue
+        _job_queue = JobQueue.from_env(run_job)
+    _job_queue.start()
+    return _job_queue
+
+async def close_resources() -> None:
+    """Stop the job workers and release the agent, if this process created them"""
+    global _job_queue
+    # Running jobs get GRACEFUL_SHUTDOWN_SECONDS to finish; the rest go back to the queue
+    if _job_queue is not None:
+        await _job_queue.close()
+        _job_queue = None
+    # Delete cachedContents this worker created and close its upstream connections and decision cache
+    if _agents is not None:
+        await _agents.close()
+
+_admission: Optional[AdmissionController] = None
+
+def loaded_resources() -> Tuple[Optional["IntelligentAgent"], Optional["JobQueue"], Optional[AdmissionController]]:
+    """The agent, job queue and admission controller this worker has built so far, without building any"""
+    agents = _agents.loaded() if _agents is not None else []
+    return (agents[0] if agents else None), _job_queue, _admission
+
+def upstream_pressure() -> float:
+    # Asked from inside admit(), so this is the agent of the loop being admitted to
+    return _agents.get().upstream_pressure()
+
+# Dependency to get the admission controller; it sheds by the agent's upstream pressure
+async def get_admission(agent = Depends(get_agent)) -> AdmissionController:
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController.from_env(pressure=upstream_pressure)
+    return _admission
+
+@router.post("/task", response_model=TaskResponse, response_model_exclude_none=True)
 async def process_task(
     request: TaskRequest,
-    agent = Depends(get_agent)
+    agent = Depends(get_agent),
+    admission: AdmissionController = Depends(get_admission)
 ):
     """
     Process a decision-making task using the Intelligent Agent.
     
     This endpoint takes a task description and relevant context,
     and returns a structured decision with reasoning and confidence.
+    Under load, requests are admitted by priority; shed requests get 429 or
+    503 with a Retry-After header.
     """
+    usage_endpoint.set("/task")
     try:
         logger.info(f"Processing task: '{request.task[:80]}...'")
         
-        # Generate decision using the agent
-        decision = await agent.generate_decision(
-            task_description=request.task,
-            context={"details": request.context, "priority": request.priority}
-        )
-        
-        # Generate a decision ID
-        import hashlib
-        input_str = f"{request.task}{request.context}{request.priority}"
-        decision_hash = hashlib.md5(input_str.encode()).hexdigest()[:8]
-        decision_id = f"decision_{decision_hash}"
-        
-        # Convert to frontend-expected format
-        response = convert_decision_to_response(decision, decision_id)
+        # Generate decision and encode it in the frontend-expected format
+        async with admission.admit(request.priority):
+            with start_span("process_task", {"task.priority": request.priority, "task.chars": len(request.task)}):
+                decision = await decide(request, agent)
+        with STAGE_SECONDS.time("convert"):
+            # Cached decisions cost no tokens
+            usage = (decision.usage or TokenUsage()) if request.include_usage else None
+            content = encode_task_response(decision, make_decision_id(request), usage)
         
         logger.info("✅ Task processed successfully.")
-        return response
+        # Returning a Response skips FastAPI's response_model validation and re-encoding;
+        # response_model still documents the schema
+        return Response(content=content, media_type="application/json")
         
+    except AdmissionRejected as e:
+        raise admission_error(e)
     except Exception as e:
         logger.error(f"Error processing task '{request.task[:80]}...': {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"An unexpected error occurred: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@router.post("/task/stream")
+async def process_task_stream(
+    request: TaskRequest,
+    agent = Depends(get_agent),
+    admission: AdmissionController = Depends(get_admission)
+):
+    """
+    Stream a decision-making task as Server-Sent Events.
+    
+    Emits `decision`, `confidence`, `reasoning` and `key_factors` events as soon as
+    the model has produced each field, followed by a `result` event carrying the
+    same TaskResponse that POST /task returns.
+    """
+    logger.info(f"Streaming task: '{request.task[:80]}...'")
+
+    # Admit before the response starts so a shed request still gets a 429/503 status;
+    # the slot is held until the stream ends
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(admission.admit(request.priority))
+    except AdmissionRejected as e:
+        raise admission_error(e)
+
+    async def event_stream():
+        usage_endpoint.set("/task/stream")
+        async with slot:
+            try:
+                async for event, data in agent.stream_decision(
+                    task_description=request.task,
+                    context={"details": request.context, "priority": request.priority},
+                    priority=request.priority
+                ):
+                    if event == "complete":
+                        with STAGE_SECONDS.time("convert"):
+                            usage = (data.usage or TokenUsage()) if request.include_usage else None
+                            result = encode_task_response(data, make_decision_id(request), usage).decode()
+                        yield f"event: result\ndata: {result}\n\n"
+                    else:
+                        yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            except Exception as e:
+                logger.error(f"Error streaming task '{request.task[:80]}...': {e}", exc_info=True)
+                yield f"event: error\ndata: {json.dumps(f'An unexpected error occurred: {str(e)}')}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also releases the slot if the client disconnects before the stream starts
+        background=BackgroundTask(slot.aclose)
+    )
+
+@router.post("/tasks/batch", response_model=BatchTaskResponse)
+async def process_task_batch(
+    batch: BatchTaskRequest,
+    agent = Depends(get_agent)
+):
+    """
+    Process many decision-making tasks in one request.
+    
+    Tasks are fanned out through the agent with bounded concurrency and a
+    per-item timeout. Results come back in request order; a failing item is
+    reported in its own slot instead of failing the whole batch.
+    """
+    if len(batch.tasks) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch.tasks)} tasks (maximum is {BATCH_MAX_ITEMS})."
+        )
+
+    usage_endpoint.set("/tasks/batch")
+    concurrency = min(batch.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    item_timeout = batch.item_timeout or BATCH_ITEM_TIMEOUT
+    semaphore = asyncio.Semaphore(concurrency)
+    logger.info(f"Processing batch of {len(batch.tasks)} tasks (concurrency={concurrency})")
+
+    async def run_item(index: int, request: TaskRequest) -> BatchTaskResult:
+        async with semaphore:
+            try:
+                response = await asyncio.wait_for(run_task(request, agent), timeout=item_timeout)
+                return BatchTaskResult(index=index, status="ok", result=response)
+            except asyncio.TimeoutError:
+                logger.warning(f"⏱️ Batch item {index} timed out after {item_timeout}s")
+                return BatchTaskResult(index=index, status="error", error=f"Timed out after {item_timeout}s")
+            except Exception as e:
+                logger.error(f"Error processing batch item {index}: {e}", exc_info=True)
+                return BatchTaskResult(index=index, status="error", error=str(e))
+
+    results = await asyncio.gather(*(run_item(i, r) for i, r in enumerate(batch.tasks)))
+    succeeded = sum(1 for result in results if result.status == "ok")
+
+    logger.info(f"✅ Batch processed: {succeeded}/{len(results)} succeeded.")
+    response = BatchTaskResponse(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+    # Serialized by pydantic-core directly instead of FastAPI re-validating response_model
+    return Response(content=response.model_dump_json(), media_type="application/json")
+
+@router.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(
+    request: TaskRequest,
+    queue = Depends(get_job_queue)
+):
+    """
+    Queue a decision-making task and return a job id immediately.
+    
+    The task runs on the in-process worker pool. Poll GET /jobs/{job_id} for its
+    status and fetch the TaskResponse from GET /jobs/{job_id}/result.
+    """
+    from logic.job_queue import QueueFull
+
+    try:
+        job = await queue.submit(request.model_dump())
+    except QueueFull as e:
+        logger.warning(f"🚦 Rejecting job: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    logger.info(f"Queued job {job.id} for task: '{request.task[:80]}...'")
+    return JobSubmitResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"/jobs/{job.id}",
+        result_url=f"/jobs/{job.id}/result"
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(
+    job_id: str,
+    queue = Depends(get_job_queue)
+):
+    """Return the status of a queued task."""
+    job = await queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job_status(job)
+
+@router.get("/jobs/{job_id}/result", response_model=TaskResponse, response_model_exclude_none=True)
+async def get_job_result(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, description="Seconds to wait for the job to finish"),
+    queue = Depends(get_job_queue)
+):
+    """
+    Return the TaskResponse of a finished job.
+    
+    While the job is still queued or running this returns 202 with the job status;
+    pass `wait` to long-poll instead of polling repeatedly.
+    """
+    job = await queue.wait(job_id, min(wait, JOB_RESULT_MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {job.error}")
+    if job.status != "succeeded":
+        return JSONResponse(
+            status_code=202,
+            content=job_status(job).model_dump(),
+            headers={"Retry-After": "1"}
+        )
+    return FastJSONResponse(job.result)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the Agentic-XAI API.
+
+Runs a single worker unless WEB_CONCURRENCY asks for more. Every worker has its
+own decision and semantic caches, single-flight, rate limiter and, without
+JOB_QUEUE_DB_PATH, its own in-memory job store, so more than one worker needs
+the SQLite job store (a job polled on another worker would be unknown there),
+and the Gemini quota is split between the workers. With gunicorn installed
+(Linux), the app is imported once in the master and the workers fork from it;
+elsewhere uvicorn's own process manager starts the workers. Each worker builds
+and warms its own agent in the FastAPI lifespan. On SIGTERM the server stops accepting
+connections and lets in-flight decisions finish for up to
+GRACEFUL_SHUTDOWN_SECONDS; the lifespan then gives running jobs the same time
+before it requeues what is left and releases the agent.
+"""
+
+import os
+import sys
+import logging
+from pathlib import Path
+
+# Add the api directory to Python path
+api_dir = Path(__file__).parent
+sys.path.insert(0, str(api_dir))
+
+# gunicorn is optional and POSIX-only
+try:
+    from gunicorn.app.base import BaseApplication
+    GUNICORN_AVAILABLE = True
+except ImportError:
+    BaseApplication = object
+    GUNICORN_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ServerSettings:
+    """Process, socket and shutdown settings for the production server."""
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = 1,
+        preload: bool = True,
+        graceful_timeout: float = 30.0,
+        keepalive: int = 5,
+        worker_timeout: float = 120.0,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload = preload
+        self.graceful_timeout = graceful_timeout
+        self.keepalive = keepalive
+        self.worker_timeout = worker_timeout
+
+    @classmethod
+    def from_env(cls) -> "ServerSettings":
+        return cls(
+            host=os.getenv("HOST", "0.0.0.0"),
+            port=int(os.getenv("PORT", "8000")),
+            # WEB_CONCURRENCY is the worker count convention most PaaS platforms set
+            workers=max(int(os.getenv("WEB_CONCURRENCY") or 1), 1),
+            preload=os.getenv("SERVER_PRELOAD", "true").lower() not in ("0", "false", "no"),
+            graceful_timeout=float(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "30")),
+            keepalive=int(os.getenv("SERVER_KEEPALIVE_SECONDS", "5")),
+            worker_timeout=float(os.getenv("SERVER_WORKER_TIMEOUT", "120")),
+        )
+
+
+class GunicornServer(BaseApplication):
+    """gunicorn master with uvicorn workers, configured in code instead of a config file."""
+
+    def __init__(self, app, settings: ServerSettings):
+        self.application = app
+        self.settings = settings
+        super().__init__()
+
+    def load_config(self):
+        self.cfg.set("bind", f"{self.settings.host}:{self.settings.port}")
+        self.cfg.set("workers", self.settings.workers)
+        self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+        self.cfg.set("preload_app", self.settings.preload)
+        self.cfg.set("graceful_timeout", self.settings.graceful_timeout)
+        self.cfg.set("keepalive", self.settings.keepalive)
+        self.cfg.set("timeout", self.settings.worker_timeout)
+
+    def load(self):
+        if self.application is None:
+            from main import app
+            self.application = app
+        return self.application
+
+
+def run(app=None, settings: ServerSettings = None) -> None:
+    """Serve the API; pass an already imported app to reuse it in the master process."""
+    import uvicorn
+
+    settings = settings or ServerSettings.from_env()
+    if settings.workers > 1 and not os.getenv("JOB_QUEUE_DB_PATH"):
+        logger.error(
+            f"💥 WEB_CONCURRENCY={settings.workers} needs JOB_QUEUE_DB_PATH: in-memory jobs are only visible "
+            f"to the worker that accepted them. Starting a single worker."
+        )
+        settings.workers = 1
+    # Workers read this to take their share of the Gemini quota (RateLimiter.from_env)
+    os.environ["WEB_CONCURRENCY"] = str(settings.workers)
+
+    if settings.workers > 1 and GUNICORN_AVAILABLE:
+        logger.info(f"🚀 Starting gunicorn with {settings.workers} uvicorn workers on port {settings.port}")
+        if app is None and settings.preload:
+            from main import app
+        GunicornServer(app, settings).run()
+    elif settings.workers > 1:
+        # Workers are spawned and import the app themselves, so nothing is preloaded
+        logger.info(f"🚀 Starting uvicorn with {settings.workers} workers on port {settings.port}")
+        uvicorn.run(
+            "main:app",
+            host=settings.host,
+            port=settings.port,
+            workers=settings.workers,
+            timeout_keep_alive=settings.keepalive,
+            timeout_graceful_shutdown=settings.graceful_timeout,
+        )
+    else:
+        if app is None:
+            from main import app
+        logger.info(f"🚀 Starting uvicorn on port {settings.port}")
+        uvicorn.run(
+            app,
+            host=settings.host,
+            port=settings.port,
+            timeout_keep_alive=settings.keepalive,
+            timeout_graceful_shutdown=settings.graceful_timeout,
+        )
+
+
+if __name__ == "__main__":
+    run()
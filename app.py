@@ -5,7 +5,6 @@ This file allows Azure to easily locate and run the FastAPI application
 """
 
 import sys
-import os
 from pathlib import Path
 
 # Add the api directory to Python path
@@ -17,9 +16,9 @@ from main import app
 
 # For Railway deployment
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Production server; one worker unless WEB_CONCURRENCY (with JOB_QUEUE_DB_PATH) asks for more
+    from server import run
+    run(app)
 
 # For WSGI compatibility (Azure App Service)
 application = app 
\ No newline at end of file
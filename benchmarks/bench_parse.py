@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for extracting the decision JSON from model output.
+
+Runs every sample in benchmarks/corpus/model_outputs.jsonl through the previous
+regex/find-rfind approach and through api.logic.json_extract, and reports for
+each whether a complete decision was recovered and how long parsing took.
+
+Usage (from the repository root):
+    python benchmarks/bench_parse.py
+    python benchmarks/bench_parse.py --iterations 5000 --corpus my_outputs.jsonl
+"""
+
+import argparse
+import json
+import re
+import sys
+import timeit
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from api.logic.json_extract import JSON_BACKEND, extract_json  # noqa: E402
+
+FIELDS = ("decision", "confidence", "reasoning", "key_factors")
+
+
+def legacy_extract(output: str) -> dict:
+    """The extraction _parse_llm_output used before json_extract existed."""
+    json_match = re.search(r'```json\n(.*?)\n```', output, re.S)
+    if json_match:
+        json_str = json_match.group(1).strip()
+    else:
+        start_idx = output.find('{')
+        end_idx = output.rfind('}') + 1
+        if start_idx != -1 and end_idx != 0:
+            json_str = output[start_idx:end_idx]
+        else:
+            raise ValueError("No JSON found in response")
+    return json.loads(json_str)
+
+
+def succeeds(extract, output: str) -> bool:
+    try:
+        data = extract(output)
+    except ValueError:
+        return False
+    return isinstance(data, dict) and all(key in data for key in FIELDS)
+
+
+def time_per_call_us(extract, output: str, iterations: int) -> float:
+    def run():
+        try:
+            extract(output)
+        except ValueError:
+            pass
+    return timeit.timeit(run, number=iterations) / iterations * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark decision JSON extraction")
+    parser.add_argument("--corpus", default=str(REPO_ROOT / "benchmarks" / "corpus" / "model_outputs.jsonl"))
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+
+    def current_extract(output: str) -> dict:
+        return extract_json(output, FIELDS)
+
+    print(f"JSON backend: {JSON_BACKEND}, {len(samples)} samples, {args.iterations} iterations each\n")
+    print(f"{'sample':<28} {'legacy':>7} {'new':>5} {'legacy µs':>10} {'new µs':>8}")
+    totals = {"legacy_ok": 0, "new_ok": 0, "legacy_us": 0.0, "new_us": 0.0}
+    for sample in samples:
+        output = sample["output"]
+        legacy_ok = succeeds(legacy_extract, output)
+        new_ok = succeeds(current_extract, output)
+        legacy_us = time_per_call_us(legacy_extract, output, args.iterations)
+        new_us = time_per_call_us(current_extract, output, args.iterations)
+        totals["legacy_ok"] += legacy_ok
+        totals["new_ok"] += new_ok
+        totals["legacy_us"] += legacy_us
+        totals["new_us"] += new_us
+        print(f"{sample['name']:<28} {'ok' if legacy_ok else 'FAIL':>7} {'ok' if new_ok else 'FAIL':>5} "
+              f"{legacy_us:>10.1f} {new_us:>8.1f}")
+
+    count = len(samples) or 1
+    print(f"\nRecovered decisions: legacy {totals['legacy_ok']}/{len(samples)}, new {totals['new_ok']}/{len(samples)}")
+    print(f"Mean parse time: legacy {totals['legacy_us'] / count:.1f} µs, new {totals['new_us'] / count:.1f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
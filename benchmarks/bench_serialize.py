@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for turning a Decision into the POST /task response body.
+
+Compares the previous path (build a TaskResponse, let FastAPI validate it
+against response_model, run jsonable_encoder and encode with the stdlib json
+module) with encode_task_response, and checks that both produce the same JSON.
+Each response starts from a Decision rebuilt from a cached dict, as the agent
+returns it on a decision cache hit, so both numbers include that construction.
+Reports the CPU time per response.
+
+Usage (from the repository root):
+    python benchmarks/bench_serialize.py
+    python benchmarks/bench_serialize.py --iterations 20000 --reasoning-items 8
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "api"))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from logic.agent_logic import Decision  # noqa: E402
+from logic.serialization import JSON_ENCODER  # noqa: E402
+from logic.token_usage import TokenUsage  # noqa: E402
+from routes.tasks import TaskResponse, convert_decision_to_response, encode_task_response  # noqa: E402
+
+RESPONSE_FIELD = create_response_field(name="Response_process_task", type_=TaskResponse)
+
+
+def make_decision(reasoning_items: int) -> Decision:
+    return Decision(
+        decision="Proceed with a phased rollout and re-evaluate after the first milestone.",
+        confidence=0.82,
+        reasoning=[f"Reasoning point {i}: the evidence favours an incremental approach." for i in range(reasoning_items)],
+        key_factors={f"Factor {i}": f"Explanation of factor {i} and its weight." for i in range(4)},
+    )
+
+
+async def legacy_response(decision: Decision, decision_id: str, usage) -> bytes:
+    """What process_task did before: TaskResponse, response_model validation, stdlib JSON."""
+    response = convert_decision_to_response(decision, decision_id)
+    response.usage = usage
+    content = await serialize_response(
+        field=RESPONSE_FIELD, response_content=response, exclude_none=True, is_coroutine=True
+    )
+    return JSONResponse(content).body
+
+
+def cpu_per_call_us(func, iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def async_cpu_per_call_us(func, iterations: int) -> float:
+    async def repeat():
+        for _ in range(iterations):
+            await func()
+
+    start = time.process_time()
+    asyncio.run(repeat())
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark TaskResponse serialization")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--reasoning-items", type=int, default=3)
+    parser.add_argument("--usage", action="store_true", help="Include token usage in the response")
+    args = parser.parse_args()
+
+    usage = TokenUsage(prompt_tokens=420, candidates_tokens=180, total_tokens=600) if args.usage else None
+    decision_id = "decision_1a2b3c4d"
+    cached = make_decision(args.reasoning_items).model_dump()
+
+    async def legacy():
+        return await legacy_response(Decision(**cached), decision_id, usage)
+
+    def fast():
+        return encode_task_response(Decision(**cached), decision_id, usage)
+
+    legacy_body = asyncio.run(legacy())
+    if json.loads(legacy_body) != json.loads(fast()):
+        print("❌ encode_task_response output differs from the TaskResponse path")
+        return 1
+
+    results = {
+        "legacy (validate + jsonable_encoder + json)": async_cpu_per_call_us(legacy, args.iterations),
+        "encode_task_response": cpu_per_call_us(fast, args.iterations),
+    }
+
+    print(f"JSON encoder: {JSON_ENCODER}, {args.iterations} iterations, {len(legacy_body)} byte responses\n")
+    legacy_us = next(iter(results.values()))
+    for name, us in results.items():
+        print(f"{name:<46} {us:8.1f} µs/response  ({legacy_us / us:5.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the API entry module.
+
+Imports api/main.py in fresh interpreters under `python -X importtime` and
+reports the median import time of the entry module, the slowest modules it
+pulls in, and whether any module that should load lazily (the agent, httpx,
+sqlite3, OpenTelemetry) was imported at startup.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --json-out startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --max-ms 800
+
+The run exits non-zero if a lazy module was imported eagerly, if the median
+exceeds --max-ms, or, with --baseline, if it regressed by more than
+--max-regression compared with a previous --json-out file.
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+API_DIR = REPO_ROOT / "api"
+
+# Modules that must stay off the cold-start path; they load on the first request that needs them
+LAZY_MODULES = ("logic.agent_logic", "logic.job_queue", "httpx", "sqlite3", "opentelemetry", "dotenv")
+
+# "import time: self [us] | cumulative | imported package", indented by nesting depth
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def import_once(module: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) for every import made by `import module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    totals: List[float] = []
+    slowest: Dict[str, List[float]] = {}
+    eager: set = set()
+    for _ in range(args.runs):
+        imports = import_once(args.module)
+        entry = next(cumulative for name, _, cumulative, depth in imports if name == args.module and depth == 0)
+        totals.append(entry / 1000.0)
+        for name, _, cumulative, depth in imports:
+            # Direct imports of the entry module, and our own modules at any depth
+            if depth == 1 or name.startswith(("logic.", "routes.")):
+                slowest.setdefault(name, []).append(cumulative / 1000.0)
+            if name in LAZY_MODULES:
+                eager.add(name)
+
+    top = sorted(((statistics.median(ms), name) for name, ms in slowest.items()), reverse=True)[:args.top]
+    return {
+        "module": args.module,
+        "runs": args.runs,
+        "median_ms": round(statistics.median(totals), 2),
+        "min_ms": round(min(totals), 2),
+        "max_ms": round(max(totals), 2),
+        "slowest_imports_ms": {name: round(ms, 2) for ms, name in top},
+        "eager_lazy_modules": sorted(eager),
+    }
+
+
+def find_problems(report: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    problems = [f"{name} is imported at startup; it should load on first use"
+                for name in report["eager_lazy_modules"]]
+    if args.max_ms and report["median_ms"] > args.max_ms:
+        problems.append(f"median import time {report['median_ms']}ms exceeds {args.max_ms}ms")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline["median_ms"] * (1 + args.max_regression)
+        if report["median_ms"] > limit:
+            problems.append(
+                f"median import time {report['median_ms']}ms regressed from {baseline['median_ms']}ms "
+                f"(limit {limit:.1f}ms)"
+            )
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark cold-start import time of the API entry module")
+    parser.add_argument("--module", default="main", help="Entry module, importable from api/")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list")
+    parser.add_argument("--max-ms", type=float, default=0.0, help="Fail if the median exceeds this")
+    parser.add_argument("--json-out", help="Write the report as JSON to this path")
+    parser.add_argument("--baseline", help="Previous --json-out report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print(json.dumps(report, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    problems = find_problems(report, args)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✅ Cold start within limits")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
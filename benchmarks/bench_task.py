@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the /task endpoint against a local mock Gemini server.
+
+Starts benchmarks/mock_gemini.py and the API (uvicorn api.main:app) as
+subprocesses, drives /task either at a fixed concurrency (closed loop) or a
+fixed request rate (open loop), and reports latency percentiles, throughput,
+error/fallback counts and the API process's resident memory.
+
+Usage (from the repository root):
+    python benchmarks/bench_task.py --concurrency 50 --requests 2000
+    python benchmarks/bench_task.py --rps 100 --duration 30 --mock-latency-ms 800
+    python benchmarks/bench_task.py --json-out bench.json --baseline bench_baseline.json
+
+With --baseline the run exits non-zero if p95 latency or throughput regress by
+more than --max-regression compared with a previous --json-out file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process in MiB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout}s")
+
+
+def start_servers(args: argparse.Namespace) -> List[subprocess.Popen]:
+    # Per-request logging from the servers would dominate the measurement and the output
+    output = None if args.verbose else subprocess.DEVNULL
+    mock = subprocess.Popen([
+        sys.executable, str(REPO_ROOT / "benchmarks" / "mock_gemini.py"),
+        "--port", str(args.mock_port),
+        "--latency-ms", str(args.mock_latency_ms),
+        "--jitter-ms", str(args.mock_jitter_ms),
+        "--error-rate", str(args.mock_error_rate),
+        "--reasoning-items", str(args.mock_reasoning_items),
+        "--padding", str(args.mock_padding),
+    ], stdout=output, stderr=output)
+
+    env = dict(os.environ)
+    env.update({
+        "GOOGLE_API_KEY": "benchmark",
+        "GEMINI_API_BASE": f"http://127.0.0.1:{args.mock_port}/v1beta",
+        "DECISION_CACHE_ENABLED": "true" if args.cache else "false",
+        "GEMINI_RATE_LIMIT_ENABLED": "false",
+    })
+    env.pop("GEMINI_BACKENDS", None)
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app",
+         "--host", "127.0.0.1", "--port", str(args.api_port), "--log-level", "warning"],
+        cwd=str(REPO_ROOT),
+        env=env,
+        stdout=output,
+        stderr=output,
+    )
+    return [mock, api]
+
+
+async def send_task(client: httpx.AsyncClient, index: int, args: argparse.Namespace,
+                    results: Dict[str, Any], scheduled_at: Optional[float] = None) -> None:
+    task = "Should we migrate our primary database to a distributed SQL database?"
+    if not args.repeat_task:
+        task = f"{task} (benchmark request {index})"
+    started = scheduled_at if scheduled_at is not None else time.perf_counter()
+    try:
+        response = await client.post("/task", json={"task": task, "context": "Benchmark run", "priority": "medium"})
+        latency = time.perf_counter() - started
+        if response.status_code == 200:
+            results["latencies"].append(latency)
+            if response.json().get("confidence", 0) == 0:
+                results["fallbacks"] += 1
+        else:
+            results["errors"] += 1
+    except httpx.HTTPError:
+        results["errors"] += 1
+
+
+async def run_closed_loop(client: httpx.AsyncClient, args: argparse.Namespace, results: Dict[str, Any]) -> None:
+    counter = iter(range(args.requests))
+
+    async def worker() -> None:
+        for index in counter:
+            await send_task(client, index, args, results)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+async def run_open_loop(client: httpx.AsyncClient, args: argparse.Namespace, results: Dict[str, Any]) -> None:
+    # Latency is measured from the scheduled send time to avoid coordinated omission
+    total = int(args.rps * args.duration)
+    started = time.perf_counter()
+    pending = []
+    for index in range(total):
+        scheduled_at = started + index / args.rps
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        pending.append(asyncio.ensure_future(send_task(client, index, args, results, scheduled_at)))
+    await asyncio.gather(*pending)
+
+
+async def run_benchmark(args: argparse.Namespace, api_pid: int) -> Dict[str, Any]:
+    base_url = f"http://127.0.0.1:{args.api_port}"
+    await wait_until_ready(f"http://127.0.0.1:{args.mock_port}/stats")
+    await wait_until_ready(f"{base_url}/test")
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, 1000), max_keepalive_connections=max(args.concurrency, 100))
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        # Warm the API and its upstream connection pool before measuring
+        warmup = {"latencies": [], "errors": 0, "fallbacks": 0}
+        await asyncio.gather(*(send_task(client, -i - 1, args, warmup) for i in range(args.warmup)))
+
+        results: Dict[str, Any] = {"latencies": [], "errors": 0, "fallbacks": 0}
+        rss_before = rss_mb(api_pid)
+        started = time.perf_counter()
+        if args.rps:
+            await run_open_loop(client, args, results)
+        else:
+            await run_closed_loop(client, args, results)
+        elapsed = time.perf_counter() - started
+        rss_after = rss_mb(api_pid)
+
+    latencies = results["latencies"]
+    completed = len(latencies) + results["errors"]
+    return {
+        "mode": f"open-loop {args.rps} rps" if args.rps else f"closed-loop concurrency {args.concurrency}",
+        "requests": completed,
+        "succeeded": len(latencies),
+        "errors": results["errors"],
+        "fallbacks": results["fallbacks"],
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        },
+        "api_rss_mb": {
+            "before": round(rss_before, 1) if rss_before is not None else None,
+            "after": round(rss_after, 1) if rss_after is not None else None,
+        },
+        "mock": {
+            "latency_ms": args.mock_latency_ms,
+            "jitter_ms": args.mock_jitter_ms,
+            "error_rate": args.mock_error_rate,
+        },
+    }
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline_path: str, max_regression: float) -> List[str]:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    problems = []
+    p95, base_p95 = report["latency_ms"]["p95"], baseline["latency_ms"]["p95"]
+    if base_p95 and p95 > base_p95 * (1 + max_regression):
+        problems.append(f"p95 latency regressed: {p95}ms vs baseline {base_p95}ms")
+    throughput, base_throughput = report["throughput_rps"], baseline["throughput_rps"]
+    if base_throughput and throughput < base_throughput * (1 - max_regression):
+        problems.append(f"throughput regressed: {throughput} rps vs baseline {base_throughput} rps")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /task against a local mock Gemini server")
+    load = parser.add_argument_group("load")
+    load.add_argument("--concurrency", type=int, default=20, help="Closed-loop workers (ignored with --rps)")
+    load.add_argument("--requests", type=int, default=500, help="Closed-loop request count")
+    load.add_argument("--rps", type=float, default=0.0, help="Open-loop request rate; enables open-loop mode")
+    load.add_argument("--duration", type=float, default=20.0, help="Open-loop duration in seconds")
+    load.add_argument("--warmup", type=int, default=10)
+    load.add_argument("--repeat-task", action="store_true", help="Send one identical task (exercises cache/coalescing)")
+    load.add_argument("--cache", action="store_true", help="Leave the decision cache enabled")
+    mock = parser.add_argument_group("mock upstream")
+    mock.add_argument("--mock-latency-ms", type=float, default=500.0)
+    mock.add_argument("--mock-jitter-ms", type=float, default=100.0)
+    mock.add_argument("--mock-error-rate", type=float, default=0.0)
+    mock.add_argument("--mock-reasoning-items", type=int, default=3)
+    mock.add_argument("--mock-padding", type=int, default=40)
+    ports = parser.add_argument_group("servers")
+    ports.add_argument("--mock-port", type=int, default=8090)
+    ports.add_argument("--api-port", type=int, default=8091)
+    output = parser.add_argument_group("output")
+    output.add_argument("--json-out", help="Write the report as JSON to this path")
+    output.add_argument("--baseline", help="Previous --json-out report to compare against")
+    output.add_argument("--max-regression", type=float, default=0.15)
+    output.add_argument("--verbose", action="store_true", help="Show server logs")
+    args = parser.parse_args()
+
+    processes = start_servers(args)
+    try:
+        report = asyncio.run(run_benchmark(args, processes[1].pid))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    print(json.dumps(report, indent=2))
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        problems = compare_with_baseline(report, args.baseline, args.max_regression)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            return 1
+        print("✅ No regression against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
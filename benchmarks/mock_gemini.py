@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Gemini generateContent / streamGenerateContent API for benchmarks.
+
+Also stubs the cachedContents resource (create, get, TTL update, delete), so the
+context caching lifecycle can be exercised locally.
+
+Latency, jitter, error injection and response size are configurable, so the
+FastAPI/agent hot path can be measured without network access or API quota.
+
+Usage:
+    python benchmarks/mock_gemini.py --port 8090 --latency-ms 800 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def build_decision_text(reasoning_items: int, key_factors: int, padding: int) -> str:
+    decision = {
+        "decision": "Proceed with a phased rollout and re-evaluate after the first milestone.",
+        "confidence": round(random.uniform(0.55, 0.95), 2),
+        "reasoning": [f"Reasoning point {i + 1}: " + "x" * padding for i in range(reasoning_items)],
+        "key_factors": {f"Factor {i + 1}": "Impact assessment " + "y" * padding for i in range(key_factors)},
+    }
+    return "```json\n" + json.dumps(decision, indent=2) + "\n```"
+
+
+def create_app(
+    latency_ms: float = 500.0,
+    jitter_ms: float = 100.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    reasoning_items: int = 3,
+    key_factors: int = 3,
+    padding: int = 40,
+    stream_chunks: int = 8,
+) -> FastAPI:
+    app = FastAPI(title="Mock Gemini API")
+    stats = {"requests": 0, "errors": 0, "cached_content_requests": 0}
+    # cachedContents name -> {"expires_at", "tokens", "resource"}
+    cached_contents: dict = {}
+
+    async def simulate_latency() -> None:
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0.0) / 1000.0
+        await asyncio.sleep(delay)
+
+    def usage(text: str, cached_tokens: int = 0) -> dict:
+        prompt_tokens, output_tokens = 450, len(text) // 4
+        metadata = {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        }
+        if cached_tokens:
+            metadata["cachedContentTokenCount"] = cached_tokens
+        return metadata
+
+    def live_cached_content(name: str):
+        entry = cached_contents.get(name)
+        if entry is None or entry["expires_at"] < time.time():
+            cached_contents.pop(name, None)
+            return None
+        return entry
+
+    def parse_ttl(ttl: str) -> float:
+        return float(str(ttl).rstrip("s") or 3600)
+
+    def not_found(name: str) -> JSONResponse:
+        return JSONResponse(status_code=404, content={"error": {"code": 404, "message": f"{name} not found"}})
+
+    @app.post("/v1beta/cachedContents")
+    async def create_cached_content(request: Request):
+        body = await request.json()
+        name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+        parts = body.get("systemInstruction", {}).get("parts", [])
+        tokens = sum(len(part.get("text", "")) for part in parts) // 4
+        resource = {"name": name, "model": body.get("model"), "displayName": body.get("displayName", "")}
+        cached_contents[name] = {"expires_at": time.time() + parse_ttl(body.get("ttl", "3600s")), "tokens": tokens, "resource": resource}
+        return {**resource, "usageMetadata": {"totalTokenCount": tokens}}
+
+    @app.get("/v1beta/cachedContents/{cache_id}")
+    async def get_cached_content(cache_id: str):
+        name = f"cachedContents/{cache_id}"
+        entry = live_cached_content(name)
+        return entry["resource"] if entry else not_found(name)
+
+    @app.patch("/v1beta/cachedContents/{cache_id}")
+    async def update_cached_content(cache_id: str, request: Request):
+        name = f"cachedContents/{cache_id}"
+        entry = live_cached_content(name)
+        if entry is None:
+            return not_found(name)
+        body = await request.json()
+        entry["expires_at"] = time.time() + parse_ttl(body.get("ttl", "3600s"))
+        return entry["resource"]
+
+    @app.delete("/v1beta/cachedContents/{cache_id}")
+    async def delete_cached_content(cache_id: str):
+        name = f"cachedContents/{cache_id}"
+        return {} if cached_contents.pop(name, None) else not_found(name)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.head("/")
+    @app.get("/")
+    async def root():
+        return {"status": "mock"}
+
+    @app.post("/v1beta/models/{model_method}")
+    async def generate(model_method: str, request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        cached_tokens = 0
+        if body.get("cachedContent"):
+            entry = live_cached_content(body["cachedContent"])
+            if entry is None:
+                return not_found(body["cachedContent"])
+            stats["cached_content_requests"] += 1
+            cached_tokens = entry["tokens"]
+        if random.random() < error_rate:
+            stats["errors"] += 1
+            await simulate_latency()
+            return JSONResponse(status_code=error_status, content={"error": {"message": "Injected failure"}})
+
+        text = build_decision_text(reasoning_items, key_factors, padding)
+        if model_method.endswith(":streamGenerateContent"):
+            async def event_stream():
+                size = max(len(text) // stream_chunks, 1)
+                for start in range(0, len(text), size):
+                    await asyncio.sleep(latency_ms / 1000.0 / stream_chunks)
+                    chunk = {"candidates": [{"content": {"parts": [{"text": text[start:start + size]}]}}]}
+                    if start + size >= len(text):
+                        chunk["usageMetadata"] = usage(text, cached_tokens)
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n"
+            return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+        await simulate_latency()
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+            "usageMetadata": usage(text, cached_tokens),
+        }
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock Gemini API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--reasoning-items", type=int, default=3)
+    parser.add_argument("--key-factors", type=int, default=3)
+    parser.add_argument("--padding", type=int, default=40, help="Extra characters per reasoning/factor entry")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        reasoning_items=args.reasoning_items,
+        key_factors=args.key_factors,
+        padding=args.padding,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
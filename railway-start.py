@@ -3,7 +3,6 @@
 Railway startup script for Agentic-XAI API
 """
 
-import os
 import sys
 from pathlib import Path
 
@@ -16,6 +15,6 @@ from main import app
 
 # This is what Railway will run
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port) 
\ No newline at end of file
+    # Production server; one worker unless WEB_CONCURRENCY (with JOB_QUEUE_DB_PATH) asks for more
+    from server import run
+    run(app) 
\ No newline at end of file
@@ -0,0 +1,54 @@
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, List
+
+import httpx
+import pytest
+
+# The app imports its modules from api/, as main.py arranges when it runs
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "api"))
+
+DECISION = {
+    "decision": "Proceed with a phased migration.",
+    "confidence": 0.8,
+    "reasoning": ["Lower risk than a big-bang cutover."],
+    "key_factors": {"Risk": "Phasing limits the blast radius."},
+}
+USAGE_METADATA = {"promptTokenCount": 400, "candidatesTokenCount": 120, "totalTokenCount": 520}
+
+
+def gemini_response(request: httpx.Request) -> httpx.Response:
+    """A successful generateContent or streamGenerateContent reply carrying DECISION."""
+    chunk = {
+        "candidates": [{"content": {"parts": [{"text": json.dumps(DECISION)}]}, "finishReason": "STOP"}],
+        "usageMetadata": USAGE_METADATA,
+    }
+    if b"streamGenerateContent" in request.url.raw_path:
+        return httpx.Response(200, content=f"data: {json.dumps(chunk)}\n\n".encode())
+    return httpx.Response(200, json=chunk)
+
+
+@pytest.fixture
+def make_agent(monkeypatch):
+    """Build an IntelligentAgent whose upstream is `handler`; returns (agent, list of requests)."""
+    def build(handler: Callable[[httpx.Request], Any] = gemini_response, **env: str):
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+        monkeypatch.setenv("GEMINI_CONTEXT_CACHE_ENABLED", "false")
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        from logic.agent_logic import IntelligentAgent
+
+        requests: List[httpx.Request] = []
+
+        async def transport(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            response = handler(request)
+            return await response if hasattr(response, "__await__") else response
+
+        agent = IntelligentAgent()
+        agent.http_client = httpx.AsyncClient(transport=httpx.MockTransport(transport))
+        agent.context_cache.http_client = agent.http_client
+        return agent, requests
+
+    return build
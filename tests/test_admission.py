@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from logic.admission import AdmissionController, AdmissionRejected, PriorityClass
+
+
+def controller(max_concurrency=1, pressure=None, **classes):
+    return AdmissionController(
+        {name: PriorityClass(name, **config) for name, config in classes.items()},
+        max_concurrency=max_concurrency,
+        pressure=pressure,
+        default_priority=next(iter(classes)),
+    )
+
+
+async def hold(admission, priority, release):
+    async with admission.admit(priority):
+        await release.wait()
+
+
+def test_full_queue_is_rejected_with_429():
+    admission = controller(medium={"max_queue": 1, "max_queue_wait": 5})
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, "medium", release))
+        waiter = asyncio.ensure_future(hold(admission, "medium", release))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit("medium"):
+                pass
+        release.set()
+        await asyncio.gather(holder, waiter)
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429 and rejected.retry_after == 5
+    assert admission.classes["medium"].rejected["queue_full"] == 1
+    assert admission.in_flight == 0
+
+
+def test_waiting_too_long_is_rejected_with_503():
+    admission = controller(medium={"max_queue_wait": 0.05})
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, "medium", release))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit("medium"):
+                pass
+        release.set()
+        await holder
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert admission.classes["medium"].rejected["queue_timeout"] == 1
+    assert admission.in_flight == 0 and not admission.classes["medium"].queue
+
+
+def test_upstream_pressure_sheds_low_priority_first():
+    admission = controller(
+        max_concurrency=8, pressure=lambda: 3.0,
+        high={}, medium={"shed_pressure": 5.0}, low={"shed_pressure": 1.0},
+    )
+
+    async def scenario():
+        for priority in ("high", "medium"):
+            async with admission.admit(priority):
+                pass
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit("low"):
+                pass
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 503 and rejected.retry_after == 3
+    assert admission.classes["low"].rejected["upstream_saturated"] == 1
+    assert admission.classes["high"].admitted == admission.classes["medium"].admitted == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    admission = controller(medium={})
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, "medium", release))
+        waiter = asyncio.ensure_future(hold(admission, "medium", asyncio.Event()))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        release.set()
+        await holder
+        # The next request is admitted straight away
+        async with admission.admit("medium"):
+            return admission.in_flight
+
+    assert asyncio.run(scenario()) == 1
+    assert admission.in_flight == 0
+    assert admission.classes["medium"].in_flight == 0
+
+
+def test_waiter_cancelled_after_being_granted_a_slot_gives_it_back():
+    admission = controller(medium={})
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, "medium", release))
+        waiter = asyncio.ensure_future(hold(admission, "medium", asyncio.Event()))
+        await asyncio.sleep(0)
+        release.set()
+        await holder
+        # The freed slot went to the waiter, which is cancelled before it resumes
+        assert admission.in_flight == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert admission.in_flight == 0
+    assert admission.classes["medium"].in_flight == 0
+
+
+def test_freed_slots_follow_the_weights():
+    admission = controller(high={"weight": 3}, low={"weight": 1})
+    order = []
+
+    async def request(priority):
+        async with admission.admit(priority):
+            order.append(priority)
+
+    async def scenario():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, "high", release))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(request(priority)) for priority in ["low"] * 4 + ["high"] * 4]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *waiters)
+
+    asyncio.run(scenario())
+    # Smooth weighted round-robin at 3:1 while both queues are non-empty
+    assert order == ["high", "high", "low", "high", "high", "low", "low", "low"]
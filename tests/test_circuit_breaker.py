@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from conftest import gemini_response
+from logic.circuit_breaker import HALF_OPEN, OPEN
+
+QUESTION = "Should we move the billing service to a managed queue?"
+
+
+def half_open(backend):
+    breaker = backend.circuit_breaker
+    breaker._transition(OPEN)
+    breaker.opened_at = time.monotonic() - breaker.open_seconds - 1
+    return breaker
+
+
+async def failing_context_cache(*args):
+    raise RuntimeError("cachedContents lookup failed")
+
+
+def test_failure_before_the_request_falls_back_and_frees_the_probe(make_agent):
+    agent, requests = make_agent()
+    breaker = half_open(agent.router.backends[0])
+    agent.context_cache.get = failing_context_cache
+
+    async def scenario():
+        decision = await agent.generate_decision(QUESTION, {}, "medium")
+        await agent.close()
+        return decision
+
+    decision = asyncio.run(scenario())
+    assert decision.is_fallback and not requests
+    assert breaker.state == HALF_OPEN and breaker._probes_in_flight == 0
+
+
+def test_stream_failure_before_the_request_frees_the_probe(make_agent):
+    agent, requests = make_agent()
+    breaker = half_open(agent.router.backends[0])
+    agent.context_cache.get = failing_context_cache
+
+    async def scenario():
+        events = [event async for event in agent.stream_decision(QUESTION, {})]
+        await agent.close()
+        return events
+
+    events = asyncio.run(scenario())
+    assert events[0][0] == "error" and events[-1][1].is_fallback
+    assert breaker.state == HALF_OPEN and breaker._probes_in_flight == 0
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_successful_probe_is_recorded_once(make_agent, stream):
+    agent, requests = make_agent(CIRCUIT_HALF_OPEN_MAX_CALLS="2")
+    breaker = half_open(agent.router.backends[0])
+
+    async def scenario():
+        if stream:
+            [event async for event in agent.stream_decision(QUESTION, {})]
+        else:
+            await agent.generate_decision(QUESTION, {}, "medium")
+        await agent.close()
+
+    asyncio.run(scenario())
+    assert len(requests) == 1
+    assert breaker.state == HALF_OPEN
+    assert breaker._probe_successes == 1 and breaker._probes_in_flight == 0
+
+
+def test_rate_limit_wait_and_retry_sleep_are_not_upstream_latency(make_agent, monkeypatch):
+    statuses = [503, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        return gemini_response(request) if status == 200 else httpx.Response(status)
+
+    agent, requests = make_agent(handler, CIRCUIT_SLOW_CALL_SECONDS="0.2")
+    backend = agent.router.backends[0]
+    monkeypatch.setattr(agent.retry_policy, "backoff", lambda attempt: 0.3)
+
+    async def queued_acquire(estimated_tokens):
+        # A saturated local quota
+        await asyncio.sleep(0.3)
+
+    agent.rate_limiter.acquire = queued_acquire
+
+    async def scenario():
+        decision = await agent.generate_decision(QUESTION, {}, "medium")
+        await agent.close()
+        return decision
+
+    decision = asyncio.run(scenario())
+    assert not decision.is_fallback and len(requests) == 2
+    assert backend.latency.quantile(0.5) < 0.2
+    assert not any(slow for _, _, slow in backend.circuit_breaker._calls)
@@ -0,0 +1,68 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from logic.decision_cache import DecisionCache, MemoryCacheTier, SQLiteCacheTier
+
+
+def test_sqlite_tier_runs_off_the_event_loop(tmp_path, monkeypatch):
+    tier = SQLiteCacheTier(str(tmp_path / "cache.sqlite3"))
+    threads = []
+    original_get = SQLiteCacheTier.get
+
+    def recording_get(self, key):
+        threads.append(threading.current_thread())
+        return original_get(self, key)
+
+    monkeypatch.setattr(SQLiteCacheTier, "get", recording_get)
+    cache = DecisionCache(tiers=[MemoryCacheTier(), tier])
+
+    async def scenario():
+        await cache.set("key", {"decision": "Go"})
+        cache.tiers[0].clear()
+        return await cache.get("key"), threading.current_thread()
+
+    value, loop_thread = asyncio.run(scenario())
+    assert value == {"decision": "Go"}
+    assert threads and threads[0] is not loop_thread
+    # The hit was promoted into the memory tier
+    assert cache.tiers[0].get("key") == {"decision": "Go"}
+
+
+def test_sqlite_tier_trims_every_interval(tmp_path):
+    tier = SQLiteCacheTier(str(tmp_path / "cache.sqlite3"), max_entries=5, trim_interval=4)
+    for index in range(8):
+        tier.set(f"key-{index}", {"index": index})
+    assert len(tier) == 5
+    assert tier.evictions == 3
+    assert tier.get("key-0") is None and tier.get("key-7") == {"index": 7}
+
+
+def test_sqlite_tier_drops_expired_rows_when_trimming(tmp_path):
+    tier = SQLiteCacheTier(str(tmp_path / "cache.sqlite3"), ttl_seconds=-1, trim_interval=2)
+    tier.set("a", {})
+    tier.set("b", {})
+    assert len(tier) == 0 and tier.expirations == 2
+
+
+def test_closing_the_cache_releases_the_sqlite_tier(tmp_path):
+    tier = SQLiteCacheTier(str(tmp_path / "cache.sqlite3"))
+    cache = DecisionCache(tiers=[MemoryCacheTier(), tier])
+
+    async def scenario():
+        await cache.set("key", {"decision": "Go"})
+        await cache.close()
+
+    asyncio.run(scenario())
+    assert tier.executor._shutdown
+    with pytest.raises(sqlite3.ProgrammingError):
+        tier._conn.execute("SELECT 1")
+
+
+def test_closing_the_agent_closes_its_decision_cache(make_agent, tmp_path):
+    agent, _ = make_agent(DECISION_CACHE_DB_PATH=str(tmp_path / "cache.sqlite3"))
+    tier = agent.decision_cache.tiers[-1]
+    asyncio.run(agent.close())
+    assert isinstance(tier, SQLiteCacheTier) and tier.executor._shutdown
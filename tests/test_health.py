@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+
+import main
+from routes import tasks
+
+
+def test_health_does_not_build_the_agent_or_job_queue(monkeypatch):
+    monkeypatch.setattr(main, "LAZY_STARTUP", True)
+    monkeypatch.setattr(tasks, "_agents", None)
+    monkeypatch.setattr(tasks, "_job_queue", None)
+    monkeypatch.setattr(tasks, "_admission", None)
+
+    with TestClient(main.app) as client:
+        response = client.get("/health")
+
+    assert response.status_code == 200
+    assert response.json()["agent_loaded"] is False
+    assert tasks._agents is None and tasks._job_queue is None
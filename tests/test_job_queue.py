@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+from logic.job_queue import JobQueue, MemoryJobStore, SQLiteJobStore
+
+
+def test_sqlite_jobs_run_off_the_event_loop(tmp_path, monkeypatch):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    threads = set()
+    original_claim = SQLiteJobStore.claim
+
+    def recording_claim(self):
+        threads.add(threading.current_thread())
+        return original_claim(self)
+
+    monkeypatch.setattr(SQLiteJobStore, "claim", recording_claim)
+
+    async def handler(payload):
+        return {"echo": payload["task"]}
+
+    async def scenario():
+        queue = JobQueue(handler, store=store, workers=2, poll_interval=0.05)
+        queue.start()
+        job = await queue.submit({"task": "ship it"})
+        finished = await queue.wait(job.id, timeout=5)
+        stats = await queue.stats()
+        await queue.stop()
+        return finished, stats, threading.current_thread()
+
+    finished, stats, loop_thread = asyncio.run(scenario())
+    assert finished.status == "succeeded" and finished.result == {"echo": "ship it"}
+    assert stats["jobs"]["succeeded"] == 1
+    assert threads and loop_thread not in threads
+
+
+def test_stopping_requeues_jobs_still_running_after_the_drain(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def scenario():
+        running = asyncio.Event()
+
+        async def handler(payload):
+            running.set()
+            await asyncio.sleep(60)
+
+        queue = JobQueue(handler, store=store, workers=1, poll_interval=0.05, drain_seconds=0.1)
+        queue.start()
+        job = await queue.submit({"task": "slow"})
+        await asyncio.wait_for(running.wait(), timeout=5)
+        await queue.stop()
+        return await queue.get(job.id)
+
+    job = asyncio.run(scenario())
+    assert job.status == "queued"
+
+
+def test_stopping_lets_running_jobs_finish_and_claims_no_new_ones():
+    store = MemoryJobStore()
+
+    async def scenario():
+        running = asyncio.Event()
+        release = asyncio.Event()
+
+        async def handler(payload):
+            running.set()
+            await release.wait()
+            return {"done": payload["task"]}
+
+        queue = JobQueue(handler, store=store, workers=1, poll_interval=0.05, drain_seconds=5)
+        queue.start()
+        first = await queue.submit({"task": "in flight"})
+        await asyncio.wait_for(running.wait(), timeout=5)
+        second = await queue.submit({"task": "not started"})
+        stopping = asyncio.ensure_future(queue.stop())
+        await asyncio.sleep(0.1)
+        assert not stopping.done()
+        release.set()
+        await asyncio.wait_for(stopping, timeout=5)
+        return await queue.get(first.id), await queue.get(second.id)
+
+    first, second = asyncio.run(scenario())
+    assert first.status == "succeeded" and first.result == {"done": "in flight"}
+    assert second.status == "queued"
+
+
+def test_closing_the_queue_closes_the_sqlite_store(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def handler(payload):
+        return {}
+
+    async def scenario():
+        queue = JobQueue(handler, store=store, workers=1, poll_interval=0.05)
+        queue.start()
+        await queue.close()
+
+    asyncio.run(scenario())
+    assert store.executor._shutdown
@@ -0,0 +1,30 @@
+import time
+
+from logic.json_extract import extract_json, iter_json_objects
+
+
+def test_objects_are_found_around_prose_and_braces_in_strings():
+    text = 'Sure! ```json\n{"a": {"b": "}"}}\n``` and also {"c": "{"} done'
+    assert list(iter_json_objects(text)) == ['{"a": {"b": "}"}}', '{"c": "{"}']
+
+
+def test_quotes_in_prose_do_not_hide_objects():
+    assert list(iter_json_objects('Don\'t say "hi {"a": 1} or }')) == ['{"a": 1}']
+
+
+def test_escaped_quotes_and_backslashes_stay_inside_strings():
+    text = r'{"a": "say \"}\" \\"} {"b": 2}'
+    assert list(iter_json_objects(text)) == [r'{"a": "say \"}\" \\"}', '{"b": 2}']
+
+
+def test_objects_after_an_unclosed_brace_are_still_found_in_order():
+    text = 'use a {placeholder like {"x": 1} here, then {"decision": "go"}'
+    assert list(iter_json_objects(text)) == ['{"x": 1}', '{"decision": "go"}']
+    assert extract_json(text, ["decision"]) == {"decision": "go"}
+
+
+def test_unterminated_braces_scan_in_linear_time():
+    text = '{"a": ' * 20_000
+    started = time.perf_counter()
+    assert list(iter_json_objects(text)) == []
+    assert time.perf_counter() - started < 0.5
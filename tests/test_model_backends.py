@@ -0,0 +1,29 @@
+import asyncio
+import json
+
+QUESTION = "Should we move the billing service to a managed queue?"
+
+
+def test_local_quota_wait_does_not_penalise_the_chosen_backend(make_agent):
+    backends = [{"name": "fast", "url": "http://fast/v1beta/models/a:generateContent"},
+                {"name": "other", "url": "http://other/v1beta/models/b:generateContent"}]
+    agent, requests = make_agent(GEMINI_BACKENDS=json.dumps(backends), ROUTER_EXPLORE_RATE="0")
+    fast, other = agent.router.backends
+    for _ in range(5):
+        other.record(failed=False, latency=0.1)
+
+    async def queued_acquire(estimated_tokens):
+        # Waiting for the shared per-key quota, not for the backend
+        await asyncio.sleep(0.3)
+
+    agent.rate_limiter.acquire = queued_acquire
+
+    async def scenario():
+        decision = await agent.generate_decision(QUESTION, {}, "medium")
+        await agent.close()
+        return decision
+
+    assert not asyncio.run(scenario()).is_fallback
+    assert [request.url.host for request in requests] == ["fast"]
+    assert fast.latency.quantile(0.99) < 0.1
+    assert agent.router.select() is fast
@@ -0,0 +1,47 @@
+import asyncio
+
+from logic.agent_logic import RateLimiter
+
+
+def test_limiter_is_off_without_a_configured_quota(monkeypatch):
+    monkeypatch.delenv("GEMINI_RPM", raising=False)
+    monkeypatch.delenv("GEMINI_TPM", raising=False)
+    limiter = RateLimiter.from_env()
+    assert not limiter.enabled
+    assert limiter.backlog_seconds() == 0.0
+    assert limiter.stats()["requests_per_minute"] is None
+
+
+def test_unset_quota_is_unlimited(monkeypatch):
+    monkeypatch.setenv("GEMINI_RPM", "2")
+    monkeypatch.delenv("GEMINI_TPM", raising=False)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    limiter = RateLimiter.from_env()
+    limiter.mode = "shed"
+
+    async def scenario():
+        await limiter.acquire(10_000_000)
+        await limiter.acquire(10_000_000)
+
+    asyncio.run(scenario())
+    assert limiter.enabled and limiter.admitted == 2
+    assert limiter.backlog_seconds() > 0
+    assert limiter.stats()["tokens_available"] is None
+
+
+def test_try_acquire_never_waits_or_jumps_the_queue():
+    limiter = RateLimiter(requests_per_minute=1, max_wait=120)
+    assert limiter.try_acquire(10)
+    assert not limiter.try_acquire(10)
+    assert limiter.admitted == 1
+
+    async def scenario():
+        limiter.requests.tokens = 0
+        waiter = asyncio.ensure_future(limiter.acquire(10))
+        await asyncio.sleep(0)
+        # Budget freed while someone queues for it belongs to the queue
+        limiter.requests.tokens = 1
+        assert not limiter.try_acquire(10)
+        waiter.cancel()
+
+    asyncio.run(scenario())
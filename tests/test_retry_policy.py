@@ -0,0 +1,202 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from logic import retry_policy
+from logic.retry_policy import RetryBudget, RetryPolicy, parse_retry_after
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record retry sleeps instead of waiting them out."""
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(retry_policy.asyncio, "sleep", sleep)
+    return delays
+
+
+def replies(*responses):
+    """A send() that returns the given responses (or raises the given exceptions) in order."""
+    queue = list(responses)
+    calls = []
+
+    async def send():
+        calls.append(time.perf_counter())
+        reply = queue.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    return send, calls
+
+
+def test_backoff_is_full_jitter_under_a_capped_exponential():
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+    for attempt, ceiling in ((1, 0.5), (2, 1.0), (3, 2.0), (4, 3.0), (10, 3.0)):
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        # Jittered, not a fixed schedule
+        assert len(set(delays)) > 1
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert 25 <= parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_after_is_honoured(sleeps):
+    policy = RetryPolicy(max_attempts=3)
+    send, calls = replies(httpx.Response(503, headers={"retry-after": "2"}), httpx.Response(200))
+    response = asyncio.run(policy.execute(send))
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert sleeps == [2.0]
+    assert policy.retries == 1
+
+
+def test_retry_after_beyond_the_cap_returns_the_response(sleeps):
+    policy = RetryPolicy(max_attempts=3, max_retry_after=10)
+    send, calls = replies(httpx.Response(429, headers={"retry-after": "60"}), httpx.Response(200))
+    response = asyncio.run(policy.execute(send))
+    assert response.status_code == 429
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_transport_errors_back_off_and_reraise_after_the_last_attempt(sleeps):
+    policy = RetryPolicy(max_attempts=3, base_delay=0.5)
+    send, calls = replies(*[httpx.ConnectError("refused")] * 3)
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(policy.execute(send))
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+
+
+def test_exhausted_retry_budget_stops_retrying(sleeps):
+    policy = RetryPolicy(max_attempts=5, budget=RetryBudget(ratio=0.0, min_retries=1))
+    send, calls = replies(*[httpx.Response(503)] * 4)
+    assert asyncio.run(policy.execute(send)).status_code == 503
+    # One retry fits the budget; the second does not
+    assert len(calls) == 2
+    assert policy.budget_exhausted == 1
+
+    send, calls = replies(httpx.Response(503))
+    assert asyncio.run(policy.execute(send)).status_code == 503
+    assert len(calls) == 1
+    assert policy.budget_exhausted == 2
+
+
+def test_acquire_runs_before_every_attempt_and_is_not_timed(sleeps):
+    policy = RetryPolicy(max_attempts=2)
+    acquired = []
+
+    async def acquire():
+        acquired.append(True)
+        # Time spent waiting for local budget
+        time.sleep(0.05)
+
+    send, calls = replies(httpx.Response(503), httpx.Response(200))
+    assert asyncio.run(policy.execute(send, acquire=acquire)).status_code == 200
+    assert len(acquired) == 2
+    assert policy.latency.quantile(0.5) < 0.05
+
+
+def hedging_policy():
+    policy = RetryPolicy(hedge=True, hedge_min_samples=1)
+    policy.latency.record(0.01)
+    return policy
+
+
+def test_hedge_wins_and_cancels_the_slow_primary():
+    policy = hedging_policy()
+    primary_cancelled = asyncio.Event()
+    calls = []
+
+    async def send():
+        calls.append(True)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                primary_cancelled.set()
+                raise
+        return httpx.Response(200, text=f"attempt {len(calls)}")
+
+    async def scenario():
+        response = await policy.execute(send)
+        await asyncio.sleep(0)
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.text == "attempt 2"
+    assert primary_cancelled.is_set()
+    assert policy.hedges_launched == 1 and policy.hedges_won == 1
+
+
+def test_primary_wins_and_cancels_the_hedge():
+    policy = hedging_policy()
+    hedge_cancelled = asyncio.Event()
+    calls = []
+
+    async def send():
+        calls.append(True)
+        if len(calls) == 1:
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, text="primary")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            hedge_cancelled.set()
+            raise
+        return httpx.Response(200, text="hedge")
+
+    async def scenario():
+        response = await policy.execute(send)
+        await asyncio.sleep(0)
+        return response
+
+    assert asyncio.run(scenario()).text == "primary"
+    assert hedge_cancelled.is_set()
+    assert policy.hedges_launched == 1 and policy.hedges_won == 0
+
+
+def test_a_failed_hedge_does_not_beat_a_usable_primary():
+    policy = hedging_policy()
+    calls = []
+
+    async def send():
+        calls.append(True)
+        if len(calls) == 1:
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, text="primary")
+        return httpx.Response(500)
+
+    response = asyncio.run(policy.execute(send))
+    assert response.text == "primary"
+    assert policy.hedges_won == 0
+
+
+def test_no_hedge_without_free_rate_limit_budget():
+    policy = hedging_policy()
+    calls = []
+
+    async def send():
+        calls.append(True)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200)
+
+    response = asyncio.run(policy.execute(send, try_acquire=lambda: False))
+    assert response.status_code == 200
+    assert len(calls) == 1
+    assert policy.hedges_launched == 0 and policy.hedges_skipped == 1
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from logic.semantic_cache import SemanticCache
+
+BASE = "Should our company migrate our primary database from PostgreSQL to CockroachDB?\n500GB, strong consistency"
+CONTEXT = {"details": "500GB, strong consistency"}
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache(enabled=True)
+    cache.add("scope", "base", BASE, {"decision": "Migrate"})
+    return cache
+
+
+def test_near_identical_request_hits(cache):
+    match = cache.lookup("scope", BASE.lower().replace(",", ""))
+    assert match is not None
+    assert match[0] == {"decision": "Migrate"}
+
+
+@pytest.mark.parametrize("question", [
+    "Should our company NOT migrate our primary database from PostgreSQL to CockroachDB?",
+    "Shouldn't our company migrate our primary database from PostgreSQL to CockroachDB?",
+    "Should our company migrate our primary database from CockroachDB to PostgreSQL?",
+    "Should our company migrate our primary database from PostgreSQL to MySQL?",
+])
+def test_opposite_or_different_question_misses(cache, question):
+    assert cache.lookup("scope", f"{question}\n500GB, strong consistency") is None
+    assert cache.stats()["hits"] == 0
+
+
+def test_different_numbers_miss(cache):
+    assert cache.lookup("scope", BASE.replace("500GB", "900GB")) is None
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Should we buy more Nvidia shares this quarter?", "Should we sell more Nvidia shares this quarter?"),
+    ("Should we increase the marketing budget next year?", "Should we decrease the marketing budget next year?"),
+])
+def test_opposite_verbs_miss(stored, asked):
+    cache = SemanticCache(enabled=True, threshold=0.5)
+    cache.add("scope", "stored", stored, {"decision": "Yes"})
+    assert cache.lookup("scope", asked) is None
+    assert cache.stats()["rejections"] == 1
+
+
+def test_scopes_are_isolated(cache):
+    assert cache.lookup("other-scope", BASE) is None
+
+
+def test_expired_entries_miss():
+    cache = SemanticCache(enabled=True, ttl_seconds=-1)
+    cache.add("scope", "base", BASE, {"decision": "Migrate"})
+    assert cache.lookup("scope", BASE) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction():
+    cache = SemanticCache(enabled=True, max_entries=1)
+    cache.add("scope", "first", BASE, {"decision": "Migrate"})
+    cache.add("scope", "second", "Should we hire a contractor for the redesign?", {"decision": "Hire"})
+    assert cache.lookup("scope", BASE) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_streamed_decision_is_indexed_by_its_question(make_agent):
+    # The exact-key cache is off so the repeat can only be answered semantically
+    agent, requests = make_agent(SEMANTIC_CACHE_ENABLED="true", DECISION_CACHE_ENABLED="false")
+    question = "Should our company migrate our primary database from PostgreSQL to CockroachDB?"
+
+    async def scenario():
+        events = [event async for event in agent.stream_decision(question, CONTEXT)]
+        repeat = await agent.generate_decision(question, CONTEXT, "medium")
+        await agent.close()
+        return events, repeat
+
+    events, repeat = asyncio.run(scenario())
+    assert events[-1][0] == "complete" and not events[-1][1].is_fallback
+    assert len(requests) == 1
+    assert agent.semantic_cache.stats()["hits"] == 1
+    assert repeat.decision == events[-1][1].decision
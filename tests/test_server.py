@@ -0,0 +1,34 @@
+import os
+
+import uvicorn
+
+import server
+from logic.agent_logic import RateLimiter
+from server import ServerSettings
+
+
+def test_single_worker_by_default(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert ServerSettings.from_env().workers == 1
+
+
+def test_multiple_workers_need_a_shared_job_store(monkeypatch):
+    calls = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs)))
+    monkeypatch.delenv("JOB_QUEUE_DB_PATH", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    app = object()
+
+    server.run(app, ServerSettings.from_env())
+
+    assert calls[0][0] is app and "workers" not in calls[0][1]
+    assert os.environ["WEB_CONCURRENCY"] == "1"
+
+
+def test_workers_split_the_quota(monkeypatch):
+    monkeypatch.setenv("GEMINI_RPM", "600")
+    monkeypatch.setenv("GEMINI_TPM", "4000000")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    limiter = RateLimiter.from_env()
+    assert limiter.requests.capacity == 150
+    assert limiter.tokens.capacity == 1_000_000
@@ -0,0 +1,28 @@
+import asyncio
+
+from conftest import USAGE_METADATA, gemini_response
+
+QUESTION = "Should we adopt a four-day work week for the support team?"
+
+
+def test_coalesced_requests_report_and_record_usage_once(make_agent):
+    async def slow_gemini(request):
+        await asyncio.sleep(0.05)
+        return gemini_response(request)
+
+    agent, requests = make_agent(slow_gemini)
+
+    async def scenario():
+        decisions = await asyncio.gather(*(agent.generate_decision(QUESTION, {}, "medium") for _ in range(3)))
+        await agent.close()
+        return decisions
+
+    decisions = asyncio.run(scenario())
+    assert len(requests) == 1
+    assert agent.single_flight.stats()["coalesced"] == 2
+    leader = [d for d in decisions if d.usage is not None]
+    assert len(leader) == 1
+    assert leader[0].usage.total_tokens == USAGE_METADATA["totalTokenCount"]
+    assert all(d.decision == leader[0].decision for d in decisions)
+    totals = agent.token_usage.stats()["totals"]
+    assert sum(endpoint["requests"] for endpoint in totals.values()) == 1